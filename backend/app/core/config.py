@@ -8,13 +8,53 @@ from __future__ import annotations
 
 import json
 import logging
+import re
 import secrets
 import sys
+import threading
 from pathlib import Path
-from typing import TypedDict
+from typing import Any, TypedDict
 
 logger = logging.getLogger(__name__)
 
+# orjson 为可选加速依赖（C 实现），不可用时回退到标准库 json
+try:
+    import orjson
+
+    HAS_ORJSON = True
+except ImportError:
+    orjson = None  # type: ignore[assignment]
+    HAS_ORJSON = False
+
+
+def json_loads(raw: str | bytes) -> Any:
+    """解析 JSON 字符串/字节，优先使用 orjson。"""
+    if HAS_ORJSON:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def json_dumps(obj: Any, indent: bool = False) -> str:
+    """序列化为 JSON 字符串（不转义非 ASCII），优先使用 orjson。"""
+    if HAS_ORJSON:
+        option = orjson.OPT_INDENT_2 if indent else 0
+        return orjson.dumps(obj, option=option).decode("utf-8")
+    if indent:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    # 与 orjson 输出保持一致：紧凑分隔符，不含多余空格
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def json_dumps_bytes(obj: Any) -> bytes:
+    """序列化为紧凑 UTF-8 JSON 字节（不转义非 ASCII），适合直接写入响应流。"""
+    if HAS_ORJSON:
+        return orjson.dumps(obj)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+# 两种实现的解析错误类型（orjson.JSONDecodeError 是 ValueError 子类）
+JSON_DECODE_ERRORS: tuple[type[Exception], ...] = (ValueError, TypeError)
+
 # ── 应用版本 ──────────────────────────────────────────────
 APP_VERSION = "1.4.1"
 
@@ -56,8 +96,10 @@ else:
     LOG_DIR = BASE_DIR / "logs"
     FRONTEND_DIST_DIR = BASE_DIR.parent / "frontend" / "dist"
 
-DATA_DIR.mkdir(exist_ok=True)
-LOG_DIR.mkdir(exist_ok=True)
+# 目录通常已存在：先 stat 判断，仅首次启动时才真正 mkdir
+for _dir in (DATA_DIR, LOG_DIR):
+    if not _dir.is_dir():
+        _dir.mkdir(parents=True, exist_ok=True)
 
 DATABASE_URL = f"sqlite+aiosqlite:///{DATA_DIR / 'linkhub.db'}"
 
@@ -69,50 +111,70 @@ APP_HOST = "127.0.0.1"
 _DEFAULT_PORT = 8147
 
 
+def get_config_json_path() -> Path:
+    """返回 config.json 的路径（供 API 使用）。"""
+    if IS_FROZEN:
+        return _EXE_DIR / "config.json"
+    return BASE_DIR.parent / "config.json"
+
+
+# config.json 解析缓存: (st_mtime_ns, 解析结果)，文件未变化时跳过重复解析
+_config_cache: tuple[int, dict] | None = None
+_config_cache_lock = threading.Lock()
+
+
+def invalidate_config_cache() -> None:
+    """清空 config.json 解析缓存（写入文件后调用）。"""
+    global _config_cache
+    with _config_cache_lock:
+        _config_cache = None
+
+
 def _load_config_json() -> dict:
     """
     从 config.json 读取用户自定义配置。
     打包模式：exe 同级目录；开发模式：项目根目录。
+    以文件 mtime 为键缓存解析结果，返回副本，调用方可自由修改。
     """
-    if IS_FROZEN:
-        config_path = _EXE_DIR / "config.json"
-    else:
-        config_path = BASE_DIR.parent / "config.json"
+    global _config_cache
+    config_path = get_config_json_path()
 
+    try:
+        mtime_ns = config_path.stat().st_mtime_ns
+    except OSError:
+        return {}
     if not config_path.is_file():
         return {}
 
-    try:
-        with open(config_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-        logger.info("已加载 config.json: %s", config_path)
-        return data if isinstance(data, dict) else {}
-    except (json.JSONDecodeError, OSError) as e:
-        logger.warning("config.json 解析失败: %s", e)
-        return {}
+    with _config_cache_lock:
+        if _config_cache is not None and _config_cache[0] == mtime_ns:
+            return dict(_config_cache[1])
+
+        try:
+            with open(config_path, "rb") as f:
+                data = json_loads(f.read())
+            logger.info("已加载 config.json: %s", config_path)
+        except (*JSON_DECODE_ERRORS, OSError) as e:
+            logger.warning("config.json 解析失败: %s", e)
+            return {}
+
+        data = data if isinstance(data, dict) else {}
+        _config_cache = (mtime_ns, data)
+        return dict(data)
 
 
 def _save_config_json(data: dict) -> bool:
     """保存用户配置到 config.json。"""
-    if IS_FROZEN:
-        config_path = _EXE_DIR / "config.json"
-    else:
-        config_path = BASE_DIR.parent / "config.json"
+    config_path = get_config_json_path()
 
     try:
         with open(config_path, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        return True
+            f.write(json_dumps(data, indent=True))
     except OSError as e:
         logger.error("config.json 保存失败: %s", e)
         return False
-
-
-def get_config_json_path() -> Path:
-    """返回 config.json 的路径（供 API 使用）。"""
-    if IS_FROZEN:
-        return _EXE_DIR / "config.json"
-    return BASE_DIR.parent / "config.json"
+    invalidate_config_cache()
+    return True
 
 
 _user_config = _load_config_json()
@@ -135,13 +197,15 @@ DEFAULT_ALLOWED_DIRS: list[DirEntry] = []
 # ── 目录类型常量 ──────────────────────────────────────────
 DIR_TYPE_SOFTWARE = "software"
 DIR_TYPE_WORKSPACE = "workspace"
-VALID_DIR_TYPES = {DIR_TYPE_SOFTWARE, DIR_TYPE_WORKSPACE}
+VALID_DIR_TYPES = frozenset({DIR_TYPE_SOFTWARE, DIR_TYPE_WORKSPACE})
 
 # ── 可执行文件白名单后缀 ──────────────────────────────────
-ALLOWED_EXECUTABLE_SUFFIXES: set[str] = {".exe", ".bat", ".cmd", ".lnk"}
+ALLOWED_EXECUTABLE_SUFFIXES: frozenset[str] = frozenset(
+    {".exe", ".bat", ".cmd", ".lnk"}
+)
 
 # ── 压缩包支持的后缀 ──────────────────────────────────────
-ALLOWED_ARCHIVE_SUFFIXES: set[str] = {".zip", ".7z", ".rar"}
+ALLOWED_ARCHIVE_SUFFIXES: frozenset[str] = frozenset({".zip", ".7z", ".rar"})
 
 # ── 启发式寻址：可执行文件优先关键字 ─────────────────────
 EXE_PRIORITY_KEYWORDS: list[str] = [
@@ -153,10 +217,36 @@ EXE_PRIORITY_KEYWORDS: list[str] = [
     "setup",
 ]
 
+# 预编译的关键字交替正则，单次扫描即可判断文件名是否命中任一关键字
+EXE_PRIORITY_RE = re.compile(
+    "|".join(re.escape(kw) for kw in EXE_PRIORITY_KEYWORDS), re.IGNORECASE
+)
+
 
 # ── allowed_dirs 解析辅助函数 ─────────────────────────────
 
 
+_DIR_ENTRY_KEYS = frozenset(("path", "type", "label"))
+
+
+def _is_canonical_entry(item: object) -> bool:
+    """
+    判断条目是否已是 serialize_allowed_dirs 写出的规范格式
+    （字段齐全、无多余 key、字符串已 strip），此类条目可直接复用。
+    """
+    if type(item) is not dict or not item.keys() <= _DIR_ENTRY_KEYS:
+        return False
+    p = item.get("path")
+    if type(p) is not str or not p or p != p.strip():
+        return False
+    if item.get("type") not in VALID_DIR_TYPES:
+        return False
+    if "label" in item:
+        lbl = item["label"]
+        return type(lbl) is str and bool(lbl) and lbl == lbl.strip()
+    return True
+
+
 def parse_allowed_dirs(raw_json: str) -> list[DirEntry]:
     """
     解析 allowed_dirs 的 JSON 字符串，兼容新旧两种格式：
@@ -167,14 +257,19 @@ def parse_allowed_dirs(raw_json: str) -> list[DirEntry]:
     if not raw_json:
         return []
     try:
-        parsed = json.loads(raw_json)
-    except (json.JSONDecodeError, TypeError):
+        parsed = json_loads(raw_json)
+    except JSON_DECODE_ERRORS:
         logger.warning("allowed_dirs JSON 解析失败: %s", raw_json[:100])
         return []
 
     if not isinstance(parsed, list):
         return []
 
+    # 快速路径: 数据库中的值通常由 serialize_allowed_dirs 写入，已是规范格式
+    if all(_is_canonical_entry(item) for item in parsed):
+        return parsed
+
+    # 慢速路径: 逐项容错解析（旧格式、手工编辑或导入的数据）
     entries: list[DirEntry] = []
     for item in parsed:
         if isinstance(item, dict):
@@ -207,4 +302,4 @@ def all_dir_paths(entries: list[DirEntry]) -> list[Path]:
 
 def serialize_allowed_dirs(entries: list[DirEntry]) -> str:
     """将 DirEntry 列表序列化为 JSON 字符串。"""
-    return json.dumps(entries, ensure_ascii=False)
+    return json_dumps(entries)
@@ -7,10 +7,11 @@ Windows DPAPI 加密工具 (via ctypes, 无额外依赖)
 存储格式: base64 编码的 DPAPI blob (prefix: "dpapi:")
 """
 
-import base64
+import binascii
 import ctypes
 import ctypes.wintypes
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -21,73 +22,97 @@ _DPAPI_PREFIX = "dpapi:"
 class _DATA_BLOB(ctypes.Structure):
     _fields_ = [
         ("cbData", ctypes.wintypes.DWORD),
-        ("pbData", ctypes.POINTER(ctypes.c_char)),
+        ("pbData", ctypes.c_void_p),
     ]
 
 
-def _dpapi_encrypt(plaintext: str) -> str:
-    """
-    使用 Windows DPAPI 加密字符串，返回带前缀的 base64 编码 blob。
-    绑定到当前用户账户（CRYPTPROTECT_UI_FORBIDDEN 标志）。
-    """
-    data = plaintext.encode("utf-8")
-    blob_in = _DATA_BLOB(
-        len(data), ctypes.cast(ctypes.c_char_p(data), ctypes.POINTER(ctypes.c_char))
-    )
-    blob_out = _DATA_BLOB()
-
-    result = ctypes.windll.crypt32.CryptProtectData(
-        ctypes.byref(blob_in),  # pDataIn
-        None,  # szDataDescr (description, optional)
-        None,  # pOptionalEntropy
-        None,  # pvReserved
-        None,  # pPromptStruct
-        0x01,  # dwFlags: CRYPTPROTECT_UI_FORBIDDEN
-        ctypes.byref(blob_out),  # pDataOut
-    )
+# 复用的输入/输出结构体与输入缓冲区（按需倍增），避免每次调用重新分配。
+# 缓冲区会暂存明文，调用结束后立即清零；并发访问由锁串行化。
+_dpapi_lock = threading.Lock()
+_blob_in = _DATA_BLOB()
+_blob_out = _DATA_BLOB()
+_in_buf = ctypes.create_string_buffer(256)
+
+
+def _load_input(data: bytes) -> None:
+    """将输入数据拷贝到复用缓冲区，并指向 _blob_in。"""
+    global _in_buf
+    size = len(_in_buf)
+    if len(data) > size:
+        while size < len(data):
+            size *= 2
+        _in_buf = ctypes.create_string_buffer(size)
+    ctypes.memmove(_in_buf, data, len(data))
+    _blob_in.cbData = len(data)
+    _blob_in.pbData = ctypes.addressof(_in_buf)
+
+
+def _dpapi_call(func, func_name: str, data: bytes) -> bytes:
+    """调用 CryptProtectData / CryptUnprotectData，返回输出 blob 的字节。"""
+    _load_input(data)
+    try:
+        result = func(
+            ctypes.byref(_blob_in),  # pDataIn
+            None,  # szDataDescr / ppszDataDescr
+            None,  # pOptionalEntropy
+            None,  # pvReserved
+            None,  # pPromptStruct
+            0x01,  # dwFlags: CRYPTPROTECT_UI_FORBIDDEN
+            ctypes.byref(_blob_out),  # pDataOut
+        )
+    finally:
+        ctypes.memset(_in_buf, 0, len(data))
 
     if not result:
         error_code = ctypes.GetLastError()
-        raise RuntimeError(f"DPAPI CryptProtectData 失败，错误码: {error_code}")
+        raise RuntimeError(f"DPAPI {func_name} 失败，错误码: {error_code}")
 
     try:
-        encrypted_bytes = bytes(ctypes.string_at(blob_out.pbData, blob_out.cbData))
-        return _DPAPI_PREFIX + base64.b64encode(encrypted_bytes).decode("ascii")
+        return ctypes.string_at(_blob_out.pbData, _blob_out.cbData)
     finally:
-        ctypes.windll.kernel32.LocalFree(blob_out.pbData)
+        # pbData 读出为 int，需显式包装为指针，避免按 32 位 int 传参被截断
+        ctypes.windll.kernel32.LocalFree(ctypes.c_void_p(_blob_out.pbData))
 
 
-def _dpapi_decrypt(ciphertext_with_prefix: str) -> str:
+def _dpapi_encrypt_many(plaintexts: list[str]) -> list[str]:
     """
-    解密带前缀的 base64 DPAPI blob，返回原始明文字符串。
+    使用 Windows DPAPI 批量加密字符串，返回带前缀的 base64 编码 blob 列表。
+    绑定到当前用户账户（CRYPTPROTECT_UI_FORBIDDEN 标志）。
     """
-    b64_data = ciphertext_with_prefix[len(_DPAPI_PREFIX) :]
-    encrypted_bytes = base64.b64decode(b64_data)
-
-    blob_in = _DATA_BLOB(
-        len(encrypted_bytes),
-        ctypes.cast(ctypes.c_char_p(encrypted_bytes), ctypes.POINTER(ctypes.c_char)),
-    )
-    blob_out = _DATA_BLOB()
-
-    result = ctypes.windll.crypt32.CryptUnprotectData(
-        ctypes.byref(blob_in),  # pDataIn
-        None,  # ppszDataDescr
-        None,  # pOptionalEntropy
-        None,  # pvReserved
-        None,  # pPromptStruct
-        0x01,  # dwFlags: CRYPTPROTECT_UI_FORBIDDEN
-        ctypes.byref(blob_out),  # pDataOut
-    )
+    with _dpapi_lock:
+        protect = ctypes.windll.crypt32.CryptProtectData
+        return [
+            _DPAPI_PREFIX
+            + binascii.b2a_base64(
+                _dpapi_call(protect, "CryptProtectData", p.encode("utf-8")),
+                newline=False,
+            ).decode("ascii")
+            for p in plaintexts
+        ]
+
+
+def _dpapi_decrypt_many(ciphertexts_with_prefix: list[str]) -> list[str]:
+    """批量解密带前缀的 base64 DPAPI blob，返回原始明文字符串列表。"""
+    with _dpapi_lock:
+        unprotect = ctypes.windll.crypt32.CryptUnprotectData
+        return [
+            _dpapi_call(
+                unprotect,
+                "CryptUnprotectData",
+                binascii.a2b_base64(c[len(_DPAPI_PREFIX) :]),
+            ).decode("utf-8")
+            for c in ciphertexts_with_prefix
+        ]
 
-    if not result:
-        error_code = ctypes.GetLastError()
-        raise RuntimeError(f"DPAPI CryptUnprotectData 失败，错误码: {error_code}")
 
-    try:
-        return ctypes.string_at(blob_out.pbData, blob_out.cbData).decode("utf-8")
-    finally:
-        ctypes.windll.kernel32.LocalFree(blob_out.pbData)
+def _dpapi_encrypt(plaintext: str) -> str:
+    """使用 Windows DPAPI 加密单个字符串。"""
+    return _dpapi_encrypt_many([plaintext])[0]
+
+
+def _dpapi_decrypt(ciphertext_with_prefix: str) -> str:
+    """解密单个带前缀的 base64 DPAPI blob。"""
+    return _dpapi_decrypt_many([ciphertext_with_prefix])[0]
 
 
 # ── 公开 API ────────────────────────────────────────────────────────────────
@@ -127,3 +152,38 @@ def decrypt_value(value: str) -> str:
     except Exception as e:
         logger.error("DPAPI 解密失败: %s", e)
         raise
+
+
+def encrypt_values(plaintexts: list[str]) -> list[str]:
+    """
+    批量加密，规则同 encrypt_value（空值与已加密值原样返回）。
+    需要加密的值在同一次加锁内完成，摊薄 ctypes/Win32 调用开销。
+    """
+    pending = [i for i, v in enumerate(plaintexts) if v and not is_encrypted(v)]
+    results = list(plaintexts)
+    if not pending:
+        return results
+    try:
+        encrypted = _dpapi_encrypt_many([plaintexts[i] for i in pending])
+    except Exception as e:
+        logger.error("DPAPI 批量加密失败: %s", e)
+        raise
+    for i, value in zip(pending, encrypted):
+        results[i] = value
+    return results
+
+
+def decrypt_values(values: list[str]) -> list[str]:
+    """批量解密，规则同 decrypt_value（空值与明文原样返回）。"""
+    pending = [i for i, v in enumerate(values) if v and is_encrypted(v)]
+    results = list(values)
+    if not pending:
+        return results
+    try:
+        decrypted = _dpapi_decrypt_many([values[i] for i in pending])
+    except Exception as e:
+        logger.error("DPAPI 批量解密失败: %s", e)
+        raise
+    for i, value in zip(pending, decrypted):
+        results[i] = value
+    return results
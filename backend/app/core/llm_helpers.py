@@ -5,43 +5,114 @@
 供 metadata_router 等模块复用。
 """
 
+import asyncio
+import functools
+import hashlib
 import logging
+import secrets
+import threading
+import time
 
 from fastapi import HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import json_dumps_bytes
 from app.core.crypto import decrypt_value
 from app.models.models import SystemSetting
 
 logger = logging.getLogger(__name__)
 
+# openai 在模块加载时导入一次，调用时只检查标志位
+try:
+    from openai import AsyncOpenAI, OpenAI
+
+    HAS_OPENAI = True
+except ImportError:
+    AsyncOpenAI = OpenAI = None  # type: ignore[assignment, misc]
+    HAS_OPENAI = False
+
+
+_LLM_CONFIG_KEYS = (
+    "llm_base_url",
+    "llm_api_key",
+    "model_chat",
+    "model_embedding",
+    "llm_max_tokens",
+    "llm_system_prompt_software",
+    "llm_system_prompt_workspace",
+)
+
+# LLM 配置缓存: (写入时刻 monotonic, 已解密配置)，配置更新时主动失效
+_LLM_CONFIG_TTL = 30.0
+_llm_config_cache: tuple[float, dict[str, str]] | None = None
+_llm_config_lock = asyncio.Lock()
+# 失效代数：每次失效 +1；查询期间若发生失效，则查询结果不写回缓存，避免缓存旧值
+_llm_config_generation = 0
+# 进程级随机前缀：重启后代数归零，旧 ETag 也不会误命中
+_LLM_CONFIG_ETAG_PREFIX = secrets.token_hex(4)
+
+
+@functools.lru_cache(maxsize=16)
+def _decrypt_cached(ciphertext: str) -> str:
+    """按密文缓存 DPAPI 解密结果；密文不变则无需再次调用 crypt32。"""
+    return decrypt_value(ciphertext)
+
+
+def invalidate_llm_config_cache() -> None:
+    """清空 LLM 配置缓存（system_settings 写入后调用）。"""
+    global _llm_config_cache, _llm_config_generation
+    _llm_config_cache = None
+    _llm_config_generation += 1
+    # 同时丢弃旧密钥的明文，避免在内存中长期保留
+    _decrypt_cached.cache_clear()
+
+
+def llm_config_etag() -> str:
+    """当前 LLM 配置版本的弱 ETag，每次 invalidate_llm_config_cache 后变化。"""
+    return f'W/"{_LLM_CONFIG_ETAG_PREFIX}-{_llm_config_generation}"'
+
 
 async def load_llm_config(db: AsyncSession) -> dict[str, str]:
-    """从 system_settings 表动态加载 LLM 相关配置，自动解密 llm_api_key。"""
-    keys = [
-        "llm_base_url",
-        "llm_api_key",
-        "model_chat",
-        "model_embedding",
-        "llm_max_tokens",
-        "llm_system_prompt_software",
-        "llm_system_prompt_workspace",
-    ]
-    result = await db.execute(select(SystemSetting).where(SystemSetting.key.in_(keys)))
-    settings = {row.key: row.value for row in result.scalars().all()}
-
-    # 解密 API key（支持明文向后兼容）
-    if "llm_api_key" in settings and settings["llm_api_key"]:
-        settings["llm_api_key"] = decrypt_value(settings["llm_api_key"])
-
-    return settings
+    """
+    从 system_settings 表动态加载 LLM 相关配置，自动解密 llm_api_key。
+    所有值在加载时即去除首尾空白。
+    结果缓存 _LLM_CONFIG_TTL 秒，避免每次推理请求都查库 + DPAPI 解密。
+    返回副本，调用方可自由修改。
+    """
+    global _llm_config_cache
+    cached = _llm_config_cache
+    if cached is not None and time.monotonic() - cached[0] < _LLM_CONFIG_TTL:
+        return dict(cached[1])
+
+    async with _llm_config_lock:
+        # 等锁期间可能已被其他协程刷新
+        cached = _llm_config_cache
+        if cached is not None and time.monotonic() - cached[0] < _LLM_CONFIG_TTL:
+            return dict(cached[1])
+
+        generation = _llm_config_generation
+        result = await db.execute(
+            select(SystemSetting.key, SystemSetting.value).where(
+                SystemSetting.key.in_(_LLM_CONFIG_KEYS)
+            )
+        )
+        # 加载时统一去除首尾空白，热路径读取后无需再逐次 strip
+        settings = {key: value.strip() for key, value in result.tuples()}
+
+        # 解密 API key（支持明文向后兼容）
+        if settings.get("llm_api_key"):
+            settings["llm_api_key"] = _decrypt_cached(settings["llm_api_key"]).strip()
+
+        if generation == _llm_config_generation:
+            _llm_config_cache = (time.monotonic(), settings)
+        return dict(settings)
 
 
 def _validate_llm_config(config: dict[str, str]):
-    """校验 LLM 配置项，缺失时抛出 HTTPException。"""
-    base_url = config.get("llm_base_url", "").strip()
-    api_key = config.get("llm_api_key", "").strip()
+    """校验 LLM 配置项，缺失时抛出 HTTPException（load_llm_config 已去除空白）。"""
+    base_url = config.get("llm_base_url", "")
+    api_key = config.get("llm_api_key", "")
 
     if not base_url:
         raise HTTPException(
@@ -56,35 +127,130 @@ def _validate_llm_config(config: dict[str, str]):
     return base_url, api_key
 
 
-def get_openai_client(config: dict[str, str]):
-    """
-    根据配置动态创建 OpenAI 兼容 Client（同步版本，已弃用，保留向后兼容）。
-    新代码应使用 get_async_openai_client()。
-    """
+# Client 缓存: (base_url, api_key 摘要) -> Client，复用 httpx 连接池与 keep-alive。
+# 同一时刻只有一套生效配置：出现新键时替换旧 Client，旧 Client 延迟
+# _RETIRED_CLIENT_GRACE 秒后关闭其连接池——进行中的请求（含较长的流式输出）仍持有引用，
+# 留出完成时间后再关闭，避免修改 base_url / api_key 后旧连接池一直滞留到 GC。
+_sync_client_cache: dict[tuple[str, str], object] = {}
+_async_client_cache: dict[tuple[str, str], object] = {}
+_RETIRED_CLIENT_GRACE = 300.0
+# 等待延迟关闭的旧 AsyncOpenAI Client -> 定时句柄（应用关闭时立即关闭）
+_retired_async_clients: dict[object, asyncio.TimerHandle] = {}
+_retired_close_tasks: set[asyncio.Task] = set()
+
+
+def _close_sync_client(client) -> None:
+    """关闭被替换的同步 Client。"""
     try:
-        from openai import OpenAI
-    except ImportError:
+        client.close()
+    except Exception as e:
+        logger.warning("OpenAI Client 关闭失败: %s", e)
+
+
+async def _close_async_client(client) -> None:
+    """关闭被替换的 AsyncOpenAI Client。"""
+    try:
+        await client.close()
+    except Exception as e:
+        logger.warning("AsyncOpenAI Client 关闭失败: %s", e)
+
+
+def _close_retired_async_client(client) -> None:
+    """宽限期结束：从待关闭表移除并发起关闭。"""
+    _retired_async_clients.pop(client, None)
+    task = asyncio.create_task(_close_async_client(client))
+    _retired_close_tasks.add(task)
+    task.add_done_callback(_retired_close_tasks.discard)
+
+
+def _retire_sync_clients() -> None:
+    """清空同步 Client 缓存，旧实例在宽限期后于后台线程关闭。"""
+    for client in _sync_client_cache.values():
+        timer = threading.Timer(_RETIRED_CLIENT_GRACE, _close_sync_client, (client,))
+        timer.daemon = True
+        timer.start()
+    _sync_client_cache.clear()
+
+
+def _retire_async_clients() -> None:
+    """清空异步 Client 缓存，旧实例在宽限期后于事件循环中关闭。"""
+    loop = asyncio.get_running_loop()
+    for client in _async_client_cache.values():
+        _retired_async_clients[client] = loop.call_later(
+            _RETIRED_CLIENT_GRACE, _close_retired_async_client, client
+        )
+    _async_client_cache.clear()
+
+
+def _client_cache_key(base_url: str, api_key: str) -> tuple[str, str]:
+    """生成 Client 缓存键，api_key 仅以摘要形式出现，不直接作为字典键保存。"""
+    digest = hashlib.blake2b(api_key.encode("utf-8"), digest_size=8).hexdigest()
+    return base_url, digest
+
+
+def _require_openai() -> None:
+    """openai 库不可用时抛出 HTTPException。"""
+    if not HAS_OPENAI:
         raise HTTPException(
             status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
             detail="openai 库未安装，请执行: pip install openai",
         )
 
+
+def get_openai_client(config: dict[str, str]):
+    """
+    根据配置获取 OpenAI 兼容 Client（同步版本，已弃用，保留向后兼容）。
+    新代码应使用 get_async_openai_client()。
+    """
+    _require_openai()
+
     base_url, api_key = _validate_llm_config(config)
-    return OpenAI(base_url=base_url, api_key=api_key)
+    key = _client_cache_key(base_url, api_key)
+    client = _sync_client_cache.get(key)
+    if client is None:
+        client = OpenAI(base_url=base_url, api_key=api_key)
+        _retire_sync_clients()
+        _sync_client_cache[key] = client
+    return client
 
 
 def get_async_openai_client(config: dict[str, str]):
     """
-    根据配置动态创建 AsyncOpenAI 兼容 Client（异步版本）。
+    根据配置获取 AsyncOpenAI 兼容 Client（异步版本）。
     不会阻塞事件循环，推荐在 FastAPI 端点中使用。
+    同一 (base_url, api_key) 复用同一实例，避免每次请求重建连接池。
     """
-    try:
-        from openai import AsyncOpenAI
-    except ImportError:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="openai 库未安装，请执行: pip install openai",
-        )
+    _require_openai()
 
     base_url, api_key = _validate_llm_config(config)
-    return AsyncOpenAI(base_url=base_url, api_key=api_key, timeout=60.0)
+    key = _client_cache_key(base_url, api_key)
+    client = _async_client_cache.get(key)
+    if client is None:
+        client = AsyncOpenAI(base_url=base_url, api_key=api_key, timeout=60.0)
+        _retire_async_clients()
+        _async_client_cache[key] = client
+    return client
+
+
+async def close_openai_clients() -> None:
+    """关闭所有缓存及等待延迟关闭的 OpenAI Client（应用关闭时调用）。"""
+    for handle in _retired_async_clients.values():
+        handle.cancel()
+    clients = [*_async_client_cache.values(), *_retired_async_clients]
+    _async_client_cache.clear()
+    _retired_async_clients.clear()
+    for client in clients:
+        await _close_async_client(client)
+
+    for client in _sync_client_cache.values():
+        _close_sync_client(client)
+    _sync_client_cache.clear()
+
+
+def sse_event(payload: dict) -> bytes:
+    """
+    将事件负载编码为一帧 SSE 字节串。
+
+    /api/llm/chat/stream 与软件描述流式生成共用此帧格式，两处契约保持一致。
+    """
+    return b"data: " + json_dumps_bytes(payload) + b"\n\n"
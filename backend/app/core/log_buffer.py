@@ -3,75 +3,174 @@
 
 提供：
   - LogBuffer: 固定大小的环形缓冲区，保留最近 N 条日志
-  - LogBroadcaster: 管理 WebSocket 连接，实时推送新日志
+  - LogBroadcaster: 通知 WebSocket 订阅者从共享缓冲区增量拉取新日志
   - BufferHandler: Python logging Handler，将日志写入 LogBuffer 并广播
 """
 
 import asyncio
+import functools
 import logging
+import threading
+import time
 from collections import deque
-from datetime import datetime
+from collections.abc import AsyncIterator
+from itertools import islice
 from typing import Any
 
 # ── 环形缓冲区 ──────────────────────────────────────────
 
 
 class LogBuffer:
-    """固定大小的日志环形缓冲区"""
+    """
+    固定大小的日志环形缓冲区。
+    按列存储（每个字段一个 deque），写入时不分配 dict，读取时才按需组装。
+    日志可能来自任意线程，多列写入与读取由一把短锁保证列之间始终对齐。
+    """
 
     def __init__(self, maxlen: int = 500):
-        self._buffer: deque[dict[str, Any]] = deque(maxlen=maxlen)
+        self._ids: deque[int] = deque(maxlen=maxlen)
+        self._timestamps: deque[str] = deque(maxlen=maxlen)
+        self._levels: deque[str] = deque(maxlen=maxlen)
+        self._loggers: deque[str] = deque(maxlen=maxlen)
+        self._messages: deque[str] = deque(maxlen=maxlen)
         self._id_counter = 0
-
-    def append(self, record: dict[str, Any]) -> dict[str, Any]:
-        self._id_counter += 1
-        record["id"] = self._id_counter
-        self._buffer.append(record)
-        return record
+        self._lock = threading.Lock()
+
+    def append(self, timestamp: str, level: str, logger: str, message: str) -> int:
+        """写入一条日志，返回分配的 id。"""
+        with self._lock:
+            self._id_counter += 1
+            self._ids.append(self._id_counter)
+            self._timestamps.append(timestamp)
+            self._levels.append(level)
+            self._loggers.append(logger)
+            self._messages.append(message)
+            return self._id_counter
+
+    def _tail(self, count: int) -> list[dict[str, Any]]:
+        """
+        将最近 count 条日志组装为 dict 列表（调用方需持有 _lock）。
+        从尾部反向迭代，只触及需要的 count 条，不遍历被跳过的旧日志。
+        """
+        rows = zip(
+            reversed(self._timestamps),
+            reversed(self._levels),
+            reversed(self._loggers),
+            reversed(self._messages),
+            reversed(self._ids),
+        )
+        tail = [
+            {"timestamp": t, "level": lv, "logger": lg, "message": m, "id": i}
+            for t, lv, lg, m, i in islice(rows, count)
+        ]
+        tail.reverse()
+        return tail
 
     def get_all(self) -> list[dict[str, Any]]:
-        return list(self._buffer)
+        with self._lock:
+            return self._tail(len(self._ids))
 
     def get_recent(self, n: int = 100) -> list[dict[str, Any]]:
-        items = list(self._buffer)
-        return items[-n:] if len(items) > n else items
+        with self._lock:
+            size = len(self._ids)
+            return self._tail(n if 0 < n < size else size)
 
+    @property
+    def last_id(self) -> int:
+        """最近一条日志的 id（缓冲区为空时为 0）。"""
+        return self._id_counter
 
-# ── WebSocket 广播器 ─────────────────────────────────────
+    def get_since(self, last_id: int) -> list[dict[str, Any]]:
+        """返回 id > last_id 的日志；已被环形缓冲区淘汰的部分无法找回。"""
+        with self._lock:
+            count = min(self._id_counter - last_id, len(self._ids))
+            if count <= 0:
+                return []
+            return self._tail(count)
 
 
-class LogBroadcaster:
-    """管理 WebSocket 连接并广播日志消息"""
+# ── WebSocket 广播器 ─────────────────────────────────────
 
-    def __init__(self):
-        self._connections: set[asyncio.Queue] = set()
 
-    def subscribe(self) -> asyncio.Queue:
-        queue: asyncio.Queue = asyncio.Queue(maxsize=200)
-        self._connections.add(queue)
-        return queue
+class LogBroadcaster:
+    """
+    日志广播器：所有订阅者共享 LogBuffer，各自记录已读到的日志 id。
+    新日志到达时只唤醒一次等待中的订阅者，由订阅者增量拉取，
+    避免为每个连接维护独立队列、逐条复制。
 
-    def unsubscribe(self, queue: asyncio.Queue):
-        self._connections.discard(queue)
+    broadcast 可在任意线程调用（如 asyncio.to_thread 中的日志）：
+    无订阅者时直接返回；非事件循环线程通过 call_soon_threadsafe 投递唤醒，
+    不加锁、不分配订阅者快照。
+    """
 
-    def broadcast(self, record: dict[str, Any]):
-        for queue in list(self._connections):
-            try:
-                queue.put_nowait(record)
-            except asyncio.QueueFull:
-                # 消费者太慢，丢弃旧消息
-                pass
+    def __init__(self, buffer: LogBuffer):
+        self._buffer = buffer
+        self._event: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._loop_thread: int | None = None
+        self._subscribers = 0
+
+    async def subscribe(self) -> AsyncIterator[dict[str, Any]]:
+        """异步迭代订阅后产生的新日志（不回放历史）。"""
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._event is None:
+            # 首次订阅或事件循环已更换（如 reload），Event 需绑定到当前循环
+            self._loop = loop
+            self._loop_thread = threading.get_ident()
+            self._event = asyncio.Event()
+        event = self._event
+
+        self._subscribers += 1
+        try:
+            last_id = self._buffer.last_id
+            while True:
+                records = self._buffer.get_since(last_id)
+                if not records:
+                    await event.wait()
+                    continue
+                last_id = records[-1]["id"]
+                for record in records:
+                    yield record
+        finally:
+            self._subscribers -= 1
+
+    def _pulse(self):
+        """唤醒当前等待中的订阅者（set 后立即 clear，相当于一次脉冲）。"""
+        event = self._event
+        if event is not None:
+            event.set()
+            event.clear()
+
+    def broadcast(self):
+        """通知订阅者有新日志，线程安全。"""
+        loop = self._loop
+        if not self._subscribers or loop is None:
+            return
+        if threading.get_ident() == self._loop_thread:
+            self._pulse()
+            return
+        try:
+            loop.call_soon_threadsafe(self._pulse)
+        except RuntimeError:
+            # 事件循环已关闭
+            pass
 
 
 # ── 全局单例 ──────────────────────────────────────────────
 
 log_buffer = LogBuffer(maxlen=500)
-log_broadcaster = LogBroadcaster()
+log_broadcaster = LogBroadcaster(log_buffer)
 
 
 # ── Logging Handler ──────────────────────────────────────
 
 
+@functools.lru_cache(maxsize=4)
+def _format_second(seconds: int) -> str:
+    """格式化到秒的本地时间戳；同一秒内的日志突发复用缓存字符串。"""
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(seconds))
+
+
 class BufferHandler(logging.Handler):
     """
     Python logging Handler：将日志记录写入 LogBuffer 并通过 WebSocket 广播。
@@ -80,15 +179,13 @@ class BufferHandler(logging.Handler):
 
     def emit(self, record: logging.LogRecord):
         try:
-            entry = {
-                "timestamp": datetime.fromtimestamp(record.created).isoformat(
-                    timespec="milliseconds"
-                ),
-                "level": record.levelname,
-                "logger": record.name,
-                "message": self.format(record),
-            }
-            log_buffer.append(entry)
-            log_broadcaster.broadcast(entry)
+            seconds = _format_second(int(record.created))
+            log_buffer.append(
+                f"{seconds}.{int(record.msecs):03d}",
+                record.levelname,
+                record.name,
+                self.format(record),
+            )
+            log_broadcaster.broadcast()
         except Exception:
             self.handleError(record)
@@ -21,6 +21,8 @@ except ImportError as _exc:
 
 # ── 全局 ChromaDB Client ─────────────────────────────────
 _chroma_client = None
+# Collection 句柄缓存（名称 -> Collection），避免每次调用 get_or_create_collection
+_collections: dict[str, object] = {}
 
 # Collection 名称常量
 COLLECTION_SOFTWARE = "software"
@@ -38,27 +40,33 @@ def get_chroma_client():
     return _chroma_client
 
 
+def _get_collection(name: str, description: str):
+    """获取（并缓存）指定名称的向量集合，不存在时自动创建。"""
+    collection = _collections.get(name)
+    if collection is None:
+        client = get_chroma_client()
+        collection = client.get_or_create_collection(
+            name=name,
+            metadata={"description": description},
+        )
+        _collections[name] = collection
+    return collection
+
+
 def get_software_collection():
     """获取软件向量集合（自动创建）。"""
-    client = get_chroma_client()
-    return client.get_or_create_collection(
-        name=COLLECTION_SOFTWARE,
-        metadata={"description": "便携软件语义索引"},
-    )
+    return _get_collection(COLLECTION_SOFTWARE, "便携软件语义索引")
 
 
 def get_workspace_collection():
     """获取工作区向量集合（自动创建）。"""
-    client = get_chroma_client()
-    return client.get_or_create_collection(
-        name=COLLECTION_WORKSPACES,
-        metadata={"description": "工作区语义索引"},
-    )
+    return _get_collection(COLLECTION_WORKSPACES, "工作区语义索引")
 
 
 def shutdown_chroma():
     """关闭 ChromaDB 客户端（应用关闭时调用）。"""
     global _chroma_client
+    _collections.clear()
     if _chroma_client is not None:
         logger.info("ChromaDB 已关闭")
         _chroma_client = None
@@ -6,7 +6,7 @@ SQLAlchemy ORM 模型定义
 import uuid
 from datetime import datetime
 
-from sqlalchemy import DateTime, String, Text, func
+from sqlalchemy import DateTime, Index, String, Text, func
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column
 
 
@@ -25,7 +25,7 @@ class PortableSoftware(Base):
         String(36), primary_key=True, default=lambda: str(uuid.uuid4())
     )
     name: Mapped[str] = mapped_column(String(255), nullable=False, index=True)
-    executable_path: Mapped[str] = mapped_column(Text, nullable=False)
+    executable_path: Mapped[str] = mapped_column(Text, nullable=False, index=True)
     install_dir: Mapped[str | None] = mapped_column(Text, default=None)  # 安装目录
     description: Mapped[str | None] = mapped_column(Text, default=None)
     tags: Mapped[str | None] = mapped_column(Text, default=None)  # JSON 字符串存储
@@ -34,8 +34,9 @@ class PortableSoftware(Base):
         DateTime, default=None
     )  # 最近使用时间
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
+    # 列表按 updated_at 倒序分页，索引可免去排序
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime, server_default=func.now(), onupdate=func.now()
+        DateTime, server_default=func.now(), onupdate=func.now(), index=True
     )
 
 
@@ -43,6 +44,8 @@ class Workspace(Base):
     """工作区表"""
 
     __tablename__ = "workspaces"
+    # 按状态过滤 + updated_at 倒序分页
+    __table_args__ = (Index("ix_workspaces_status_updated_at", "status", "updated_at"),)
 
     id: Mapped[str] = mapped_column(
         String(36), primary_key=True, default=lambda: str(uuid.uuid4())
@@ -56,7 +59,7 @@ class Workspace(Base):
     )  # not_started / active / completed / archived
     created_at: Mapped[datetime] = mapped_column(DateTime, server_default=func.now())
     updated_at: Mapped[datetime] = mapped_column(
-        DateTime, server_default=func.now(), onupdate=func.now()
+        DateTime, server_default=func.now(), onupdate=func.now(), index=True
     )
 
 
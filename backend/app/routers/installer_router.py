@@ -12,26 +12,35 @@
 Pipeline: 接收文件 → 解压 → 启发式寻址 → LLM 描述 → 入库 → 返回结果
 """
 
+import asyncio
 import logging
 import os
+import re
 import shutil
 import tarfile
+import threading
+import types
+import uuid
 import zipfile
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
+from typing import BinaryIO
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, status
-from sqlalchemy import select
+from fastapi import APIRouter, Depends, HTTPException, Query, UploadFile, status
+from sqlalchemy import insert, or_, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import (
     ALLOWED_EXECUTABLE_SUFFIXES,
     DIR_TYPE_SOFTWARE,
-    EXE_PRIORITY_KEYWORDS,
+    EXE_PRIORITY_RE,
     filter_dirs_by_type,
     parse_allowed_dirs,
 )
-from app.core.crypto import decrypt_value
 from app.core.database import get_db
+from app.core.llm_helpers import HAS_OPENAI, get_async_openai_client, load_llm_config
 from app.core.vector_store import HAS_CHROMADB, get_software_collection
 from app.models.models import PortableSoftware, SystemSetting
 from app.schemas.installer_schemas import (
@@ -41,6 +50,16 @@ from app.schemas.installer_schemas import (
     ScanDirsResponse,
 )
 
+# 可选: python-isal (Intel ISA-L) 提供 SIMD 加速的 inflate，解压吞吐可提升数倍；
+# 仅在并行解压期间经 _isal_inflate() 生效，未安装时使用标准库 zlib
+try:
+    from isal import isal_zlib
+
+    HAS_ISAL = True
+except ImportError:
+    isal_zlib = None  # type: ignore[assignment]
+    HAS_ISAL = False
+
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/installer", tags=["Auto-Installer"])
@@ -71,8 +90,15 @@ async def _get_install_base_dir(db: AsyncSession) -> Path:
 
 
 def _validate_archive_member_paths(member_names: list[str], target_dir: Path) -> None:
-    """校验压缩包成员路径，阻止路径穿越与绝对路径。"""
-    target_dir = target_dir.resolve()
+    """
+    校验压缩包成员路径，阻止路径穿越与绝对路径。
+
+    仅做字符串级规范化（normpath + 前缀比较），不为每个成员构造 Path 并 resolve：
+    解压目标是新建的空目录，成员路径尚不存在，逐个 realpath 只会带来额外的系统调用。
+    """
+    target = os.path.realpath(target_dir)
+    target_key = os.path.normcase(target)
+    target_prefix = target_key.rstrip(os.sep) + os.sep
     for member_name in member_names:
         if not member_name:
             continue
@@ -86,44 +112,156 @@ def _validate_archive_member_paths(member_names: list[str], target_dir: Path) ->
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"压缩包包含绝对路径: {member_name}",
             )
-        member_path = target_dir / member_name
         try:
-            resolved = member_path.resolve()
-        except OSError:
+            resolved = os.path.normcase(
+                os.path.normpath(os.path.join(target, member_name))
+            )
+        except (OSError, ValueError):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"非法压缩包路径: {member_name}",
             )
-        if not resolved.is_relative_to(target_dir):
+        if resolved != target_key and not resolved.startswith(target_prefix):
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"压缩包包含越界路径: {member_name}",
             )
 
 
-def _safe_extract_zip(archive_path: Path, target_dir: Path) -> None:
-    """安全解压 zip：阻止路径穿越。"""
-    with zipfile.ZipFile(archive_path, "r") as zf:
-        _validate_archive_member_paths(
-            [member.filename for member in zf.infolist()], target_dir
-        )
-        zf.extractall(target_dir)
+def _single_root_prefix(member_names: list[str]) -> str:
+    """
+    若压缩包内全部成员都位于同一个顶层文件夹下，返回该文件夹前缀（含末尾 /），
+    否则返回空字符串。仅依据中央目录判断，无需先解压。
+    """
+    roots: set[str] = set()
+    for name in member_names:
+        if not name.strip("/"):
+            continue
+        root, sep, _rest = name.partition("/")
+        if not sep:
+            return ""  # 顶层存在文件
+        roots.add(root)
+        if len(roots) > 1:
+            return ""
+    return f"{roots.pop()}/" if roots else ""
+
+
+def _safe_extract_zip(
+    archive: Path | BinaryIO, target_dir: Path, flatten_single_root: bool = False
+) -> None:
+    """
+    安全解压 zip：阻止路径穿越。archive 可为路径或可 seek 的文件对象。
+    flatten_single_root 为 True 且压缩包只有一个顶层文件夹时，解压时直接去掉该前缀，
+    省去解压后逐项 shutil.move 的第二遍遍历。
+    """
+    with zipfile.ZipFile(archive, "r") as zf:
+        members = zf.infolist()
+        names = [member.filename for member in members]
+        _validate_archive_member_paths(names, target_dir)
+
+        prefix = _single_root_prefix(names) if flatten_single_root else ""
+        if prefix:
+            # 改写成员名去掉公共前缀（读取时以 orig_filename 校验本地文件头，不受影响）
+            members = [member for member in members if member.filename != prefix]
+            for member in members:
+                member.filename = member.filename[len(prefix) :]
+            _validate_archive_member_paths([m.filename for m in members], target_dir)
+
+        if len(members) < _PARALLEL_EXTRACT_MIN_MEMBERS or _EXTRACT_WORKERS < 2:
+            for member in members:
+                zf.extract(member, target_dir)
+        else:
+            _extract_zip_members_parallel(zf, members, target_dir)
+
 
+# 成员数达到该阈值才启用多线程解压；小包串行更省开销
+_PARALLEL_EXTRACT_MIN_MEMBERS = 32
+_EXTRACT_WORKERS = min(8, os.cpu_count() or 1)
 
-def _safe_extract_tar(archive_path: Path, target_dir: Path) -> None:
-    """安全解压 tar 系列：阻止路径穿越。"""
-    with tarfile.open(archive_path, "r:*") as tf:
+
+def _extract_zip_member(zf: zipfile.ZipFile, member: zipfile.ZipInfo, target: Path):
+    """解压单个成员；并发创建公共父目录时可能撞上 FileExistsError，重试一次即可。"""
+    try:
+        zf.extract(member, target)
+    except FileExistsError:
+        zf.extract(member, target)
+
+
+# zipfile 在新建解压器时查找模块全局 zlib。替换期间使用的垫片只把 decompressobj
+# 换成 isal 版本，压缩（compressobj，isal 仅支持 0-3 级）等其余接口仍是标准库 zlib，
+# 因此替换窗口内其他代码写 zip 也不受影响。
+if HAS_ISAL:
+    _ISAL_INFLATE_ZLIB = types.ModuleType("zlib")
+    _ISAL_INFLATE_ZLIB.__dict__.update(zlib.__dict__)
+    _ISAL_INFLATE_ZLIB.decompressobj = isal_zlib.decompressobj
+_isal_inflate_lock = threading.Lock()
+_isal_inflate_users = 0
+
+
+@contextmanager
+def _isal_inflate():
+    """
+    在 with 块内让 zipfile 用 isal 创建 inflate 对象，退出后恢复标准库 zlib。
+    引用计数保证多个解压并发进行时，由最后一个退出者恢复。
+    """
+    global _isal_inflate_users
+    if not HAS_ISAL:
+        yield
+        return
+    with _isal_inflate_lock:
+        if _isal_inflate_users == 0:
+            zipfile.zlib = _ISAL_INFLATE_ZLIB
+        _isal_inflate_users += 1
+    try:
+        yield
+    finally:
+        with _isal_inflate_lock:
+            _isal_inflate_users -= 1
+            if _isal_inflate_users == 0:
+                zipfile.zlib = zlib
+
+
+def _extract_zip_members_parallel(
+    zf: zipfile.ZipFile, members: list[zipfile.ZipInfo], target_dir: Path
+) -> None:
+    """
+    多线程解压 zip 成员。inflate 在 C 层释放 GIL，各成员相互独立，可并行利用多核。
+    各线程共用同一个 ZipFile：其内部锁只串行化底层 seek/read，解压本身并行；
+    这样源可以是 UploadFile 的文件对象而不必是磁盘路径。
+    成员按体积降序轮转分配，使各线程负载大致均衡。
+    """
+    ordered = sorted(members, key=lambda m: m.file_size, reverse=True)
+    shards = [ordered[i::_EXTRACT_WORKERS] for i in range(_EXTRACT_WORKERS)]
+
+    def work(shard: list[zipfile.ZipInfo]) -> None:
+        for member in shard:
+            _extract_zip_member(zf, member, target_dir)
+
+    with _isal_inflate(), ThreadPoolExecutor(
+        max_workers=_EXTRACT_WORKERS, thread_name_prefix="unzip"
+    ) as executor:
+        # list() 迫使迭代结果，任一线程的异常在此重新抛出
+        list(executor.map(work, shards))
+
+
+def _safe_extract_tar(archive: Path | BinaryIO, target_dir: Path) -> None:
+    """安全解压 tar 系列：阻止路径穿越。archive 可为路径或可 seek 的文件对象。"""
+    if isinstance(archive, Path):
+        tf = tarfile.open(archive, "r:*")
+    else:
+        tf = tarfile.open(fileobj=archive, mode="r:*")
+    with tf:
         members = tf.getmembers()
         _validate_archive_member_paths([member.name for member in members], target_dir)
         tf.extractall(target_dir, members=members, filter="data")
 
 
-def _extract_7z(archive_path: Path, target_dir: Path) -> None:
+def _extract_7z(archive: Path | BinaryIO, target_dir: Path) -> None:
     """解压 7z 文件到目标目录（需要 py7zr 库）。"""
     try:
         import py7zr
 
-        with py7zr.SevenZipFile(archive_path, mode="r") as z:
+        with py7zr.SevenZipFile(archive, mode="r") as z:
             _validate_archive_member_paths(z.getnames(), target_dir)
             z.extractall(path=target_dir)
     except ImportError:
@@ -133,44 +271,149 @@ def _extract_7z(archive_path: Path, target_dir: Path) -> None:
         )
 
 
-SUPPORTED_ARCHIVE_SUFFIXES = {".zip", ".7z", ".tar", ".gz", ".tgz", ".bz2", ".xz"}
+SUPPORTED_ARCHIVE_SUFFIXES = frozenset(
+    {".zip", ".7z", ".tar", ".gz", ".tgz", ".bz2", ".xz"}
+)
 
 
-def _extract_archive(archive_path: Path, target_dir: Path) -> None:
-    """根据文件后缀选择解压方式。"""
-    name = archive_path.name.lower()
-    suffix = archive_path.suffix.lower()
+def _extract_archive(
+    archive: Path | BinaryIO,
+    target_dir: Path,
+    flatten_single_root: bool = False,
+    filename: str | None = None,
+) -> None:
+    """
+    根据文件后缀选择解压方式。
+    archive 可为路径，也可为可 seek 的文件对象（如 UploadFile.file），
+    后者需通过 filename 提供原始文件名以判断格式。
+    flatten_single_root 为 True 时，去掉压缩包内唯一的顶层文件夹：
+    zip 在解压时直接改写成员路径，其他格式解压后再整理目录。
+    """
+    archive_name = Path(filename) if filename else archive
+    name = archive_name.name.lower()
+    suffix = archive_name.suffix.lower()
 
     if suffix == ".zip":
-        _safe_extract_zip(archive_path, target_dir)
-    elif suffix == ".7z":
-        _extract_7z(archive_path, target_dir)
+        _safe_extract_zip(archive, target_dir, flatten_single_root)
+        return
+
+    if suffix == ".7z":
+        _extract_7z(archive, target_dir)
     elif suffix in (".gz", ".tgz", ".bz2", ".xz", ".tar") or ".tar." in name:
-        _safe_extract_tar(archive_path, target_dir)
+        _safe_extract_tar(archive, target_dir)
     else:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail=f"不支持的压缩格式: {suffix}",
         )
+    if flatten_single_root:
+        _flatten_single_nested_dir(target_dir)
+
 
+def _flatten_single_nested_dir(install_dir: Path) -> None:
+    """处理单层嵌套目录（zip 内只有一个顶层文件夹的情况）。"""
+    children = list(install_dir.iterdir())
+    if len(children) == 1 and children[0].is_dir():
+        nested = children[0]
+        # 将嵌套目录的内容移动到 install_dir
+        for item in nested.iterdir():
+            target = install_dir / item.name
+            shutil.move(str(item), str(target))
+        nested.rmdir()
 
-def _find_executables(directory: Path) -> list[Path]:
+
+def _upload_size(src: BinaryIO) -> int:
+    """返回已接收上传内容的字节数，并将读取位置复位到开头。"""
+    size = src.seek(0, os.SEEK_END)
+    src.seek(0)
+    return size
+
+
+# 扫描可执行文件时跳过的资源/缓存目录（小写比较），其中几乎不会有主程序
+_SKIP_SCAN_DIRS = frozenset(
+    {"node_modules", "locales", "resources", "cache", ".git", "__pycache__"}
+)
+# 单个目录最多收集的候选数，超过即停止遍历（大型游戏目录可能有成千上万文件）
+_MAX_EXE_CANDIDATES = 200
+# 启发式选择用：排除关键字与名称归一化表（一次性删除空格、连字符、下划线）
+_EXE_EXCLUDE_KEYWORDS = ("uninstall", "uninst", "update", "updater", "crash", "helper")
+# 编译为单个正则：一次 C 层扫描代替逐关键字的 Python 级 `in` 循环
+_EXE_EXCLUDE_RE = re.compile("|".join(map(re.escape, _EXE_EXCLUDE_KEYWORDS)))
+_NAME_NORMALIZE = str.maketrans("", "", " -_")
+
+
+def _find_executables(
+    directory: Path, limit: int = _MAX_EXE_CANDIDATES
+) -> list[os.DirEntry]:
     """
     递归扫描目录下所有可执行文件。
-    返回按优先级排序的列表。
+
+    基于 os.scandir 手动递归：DirEntry 直接携带 readdir 返回的类型信息，
+    无需像 os.walk 那样逐项 stat，也不为每个文件构造 Path。
+    返回的 DirEntry 可用 os.fspath() 取路径，其 stat() 结果会被缓存。
+    遍历顺序与 os.walk 一致（先当前目录文件，再依次进入子目录）。
+
+    遍历时即跳过 _SKIP_SCAN_DIRS 中的目录，收集满 limit 个候选后提前结束；
+    卸载/更新程序等被排除的文件单独存放，仅在没有其他候选时返回。
     """
-    executables: list[Path] = []
+    executables: list[os.DirEntry] = []
+    excluded: list[os.DirEntry] = []
+    suffixes = ALLOWED_EXECUTABLE_SUFFIXES
+
+    def walk(path: str) -> bool:
+        """返回 True 表示已收集足够候选，应停止遍历。"""
+        subdirs: list[str] = []
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name.lower() not in _SKIP_SCAN_DIRS:
+                                subdirs.append(entry.path)
+                            continue
+                        if not entry.is_file():
+                            continue
+                    except OSError:
+                        continue
+                    name = entry.name
+                    dot = name.rfind(".")
+                    if dot <= 0 or name[dot:].lower() not in suffixes:
+                        continue
+                    if _EXE_EXCLUDE_RE.search(name[:dot].lower()):
+                        excluded.append(entry)
+                        continue
+                    executables.append(entry)
+                    if len(executables) >= limit:
+                        return True
+        except OSError:
+            return False
+        for sub in subdirs:
+            if walk(sub):
+                return True
+        return False
+
+    walk(os.fspath(directory))
+    return executables or excluded[:limit]
 
-    for root, _dirs, files in os.walk(directory):
-        for fname in files:
-            fpath = Path(root) / fname
-            if fpath.suffix.lower() in ALLOWED_EXECUTABLE_SUFFIXES:
-                executables.append(fpath)
 
-    return executables
+def _entry_is_dir(entry: os.DirEntry) -> bool:
+    """与 Path.is_dir 一致：跟随符号链接，出错时视为非目录。"""
+    try:
+        return entry.is_dir()
+    except OSError:
+        return False
+
+
+def _entry_stem(entry: os.DirEntry) -> str:
+    """与 Path.stem 等价：去掉最后一个后缀的文件名。"""
+    name = entry.name
+    dot = name.rfind(".")
+    return name[:dot] if dot > 0 else name
 
 
-def _heuristic_pick(executables: list[Path], software_name: str) -> Path | None:
+def _heuristic_pick(
+    executables: list[os.DirEntry], software_name: str
+) -> os.DirEntry | None:
     """
     启发式算法选择核心可执行文件。
 
@@ -187,28 +430,25 @@ def _heuristic_pick(executables: list[Path], software_name: str) -> Path | None:
     if not executables:
         return None
 
+    # 每个候选只计算一次小写文件名，供排除过滤与打分复用
+    stems = [(_entry_stem(e).lower(), e) for e in executables]
+
     # 排除明显的非主程序
-    exclude_keywords = {"uninstall", "uninst", "update", "updater", "crash", "helper"}
-    filtered = [
-        e
-        for e in executables
-        if not any(kw in e.stem.lower() for kw in exclude_keywords)
-    ]
+    filtered = [(stem, e) for stem, e in stems if not _EXE_EXCLUDE_RE.search(stem)]
     if not filtered:
-        filtered = executables  # 如果全部被排除，回退到原始列表
+        filtered = stems  # 如果全部被排除，回退到原始列表
 
-    name_lower = (
-        software_name.lower().replace(" ", "").replace("-", "").replace("_", "")
-    )
+    name_lower = software_name.lower().translate(_NAME_NORMALIZE)
 
-    def score(exe: Path) -> tuple[int, int, int]:
+    def score(candidate: tuple[str, os.DirEntry]) -> tuple[int, int, int]:
         """
         返回排序元组 (越大越优先):
           - 名称匹配分 (0-2)
           - 关键字匹配分 (0-1)
           - 文件大小 (越大越优先)
         """
-        stem = exe.stem.lower().replace(" ", "").replace("-", "").replace("_", "")
+        stem, exe = candidate
+        stem = stem.translate(_NAME_NORMALIZE)
         # 名称匹配
         name_score = 0
         if stem == name_lower:
@@ -217,9 +457,9 @@ def _heuristic_pick(executables: list[Path], software_name: str) -> Path | None:
             name_score = 1
 
         # 优先关键字匹配
-        keyword_score = 1 if any(kw in stem for kw in EXE_PRIORITY_KEYWORDS) else 0
+        keyword_score = 1 if EXE_PRIORITY_RE.search(stem) else 0
 
-        # 文件大小
+        # 文件大小（DirEntry.stat() 结果已缓存，Windows 上通常无需额外系统调用）
         try:
             size = exe.stat().st_size
         except OSError:
@@ -227,37 +467,40 @@ def _heuristic_pick(executables: list[Path], software_name: str) -> Path | None:
 
         return (name_score, keyword_score, size)
 
-    filtered.sort(key=score, reverse=True)
-    return filtered[0]
+    # 只需要最优项：max 单次遍历即可，并列时与稳定排序一样取靠前者
+    return max(filtered, key=score)[1]
 
 
-async def _generate_description_via_llm(
-    software_name: str, exe_path: str, db: AsyncSession
-) -> str:
+async def _load_description_client(db: AsyncSession):
     """
-    尝试调用模块 C (LLM Gateway) 为软件生成描述。
-    如果 LLM 未配置或调用失败，返回空字符串（不阻塞安装流程）。
+    读取 LLM 配置并返回 (client, model)。
+    未配置或 openai 不可用时返回 (None, "")。
     """
-    try:
-        # 加载 LLM 配置
-        keys = ["llm_base_url", "llm_api_key", "model_chat"]
-        result = await db.execute(
-            select(SystemSetting).where(SystemSetting.key.in_(keys))
-        )
-        config = {row.key: row.value for row in result.scalars().all()}
+    # openai 不可用时无需读取配置
+    if not HAS_OPENAI:
+        logger.info("openai 库未安装，跳过描述生成")
+        return None, ""
 
-        base_url = config.get("llm_base_url", "").strip()
-        api_key = config.get("llm_api_key", "").strip()
-        api_key = decrypt_value(api_key)  # 支持 DPAPI 加密值
-        model = config.get("model_chat", "").strip()
+    # 加载 LLM 配置（TTL 缓存，命中时不查库、不解密）
+    config = await load_llm_config(db)
 
-        if not all([base_url, api_key, model]):
-            logger.info("LLM 未配置，跳过描述生成")
-            return ""
+    base_url = config.get("llm_base_url", "").strip()
+    api_key = config.get("llm_api_key", "").strip()
+    model = config.get("model_chat", "").strip()
+
+    if not all([base_url, api_key, model]):
+        logger.info("LLM 未配置，跳过描述生成")
+        return None, ""
+
+    # 复用缓存的 Client（配置变更时由 invalidate_llm_config_cache 失效）
+    return get_async_openai_client(config), model
 
-        from openai import AsyncOpenAI
 
-        client = AsyncOpenAI(base_url=base_url, api_key=api_key)
+async def _describe_software(
+    client, model: str, software_name: str, exe_path: str
+) -> str:
+    """调用 LLM 为单个软件生成描述；失败时返回空字符串。"""
+    try:
         response = await client.chat.completions.create(
             model=model,
             messages=[
@@ -289,29 +532,98 @@ async def _generate_description_via_llm(
     return ""
 
 
+async def _generate_description_via_llm(
+    software_name: str, exe_path: str, db: AsyncSession
+) -> str:
+    """
+    尝试调用模块 C (LLM Gateway) 为软件生成描述。
+    如果 LLM 未配置或调用失败，返回空字符串（不阻塞安装流程）。
+    """
+    try:
+        client, model = await _load_description_client(db)
+    except Exception as e:
+        logger.warning("LLM 描述生成失败（非阻塞）: %s", e)
+        return ""
+    if client is None:
+        return ""
+    return await _describe_software(client, model, software_name, exe_path)
+
+
+# 批量生成描述时的最大并发请求数（受 LLM 服务商限流约束）
+_DESCRIPTION_CONCURRENCY = 8
+
+
+async def _generate_descriptions_concurrently(
+    targets: list[tuple[str, str]], db: AsyncSession
+) -> list[str]:
+    """
+    并发为多个 (软件名, 可执行文件路径) 生成描述，并发度受信号量限制。
+    配置只读取一次，并发阶段不再使用 db 会话。返回顺序与 targets 一致。
+    """
+    if not targets:
+        return []
+    try:
+        client, model = await _load_description_client(db)
+    except Exception as e:
+        logger.warning("LLM 描述生成失败（非阻塞）: %s", e)
+        client, model = None, ""
+    if client is None:
+        return [""] * len(targets)
+
+    semaphore = asyncio.Semaphore(_DESCRIPTION_CONCURRENCY)
+
+    async def describe(name: str, exe_path: str) -> str:
+        async with semaphore:
+            return await _describe_software(client, model, name, exe_path)
+
+    return await asyncio.gather(*(describe(n, p) for n, p in targets))
+
+
+def _chroma_document(name: str, description: str, path: str) -> tuple[str, dict]:
+    """构造软件在 ChromaDB 中的文档文本与元数据。"""
+    doc_text = f"{name}. {description}" if description else name
+    return doc_text, {"name": name, "path": path, "type": "software"}
+
+
 def _index_to_chroma(software_id: str, name: str, description: str, path: str):
     """将软件信息写入 ChromaDB 向量索引。"""
     if not HAS_CHROMADB:
         return
     try:
         collection = get_software_collection()
-        doc_text = f"{name}. {description}" if description else name
-        collection.upsert(
-            ids=[software_id],
-            documents=[doc_text],
-            metadatas=[
-                {
-                    "name": name,
-                    "path": path,
-                    "type": "software",
-                }
-            ],
-        )
+        doc_text, metadata = _chroma_document(name, description, path)
+        collection.upsert(ids=[software_id], documents=[doc_text], metadatas=[metadata])
         logger.info("ChromaDB 索引更新: %s (%s)", name, software_id)
     except Exception as e:
         logger.warning("ChromaDB 索引失败（非阻塞）: %s", e)
 
 
+def _index_many_to_chroma(rows: list[dict]) -> None:
+    """
+    批量写入 ChromaDB：一次 upsert 处理整批记录，摊薄嵌入与调用开销。
+    rows 为 portable_software 的列字典（需含 id/name/description/executable_path）。
+    """
+    if not HAS_CHROMADB or not rows:
+        return
+    ids: list[str] = []
+    documents: list[str] = []
+    metadatas: list[dict] = []
+    for row in rows:
+        doc_text, metadata = _chroma_document(
+            row["name"], row["description"] or "", row["executable_path"]
+        )
+        ids.append(row["id"])
+        documents.append(doc_text)
+        metadatas.append(metadata)
+    try:
+        get_software_collection().upsert(
+            ids=ids, documents=documents, metadatas=metadatas
+        )
+        logger.info("ChromaDB 批量索引更新: %d 条", len(ids))
+    except Exception as e:
+        logger.warning("ChromaDB 批量索引失败（非阻塞）: %s", e)
+
+
 # ── API 端点 ─────────────────────────────────────────────
 
 
@@ -375,37 +687,35 @@ async def upload_and_install(
         install_dir = base_dir / f"{software_name}_{counter}"
         software_name = f"{software_name}_{counter}"
 
-    # 创建临时文件保存上传内容（流式写入，避免大文件内存溢出）
+    # 上传内容已由框架缓存在 SpooledTemporaryFile（小文件在内存，大文件在磁盘），
+    # 直接从该文件对象解压，不再额外拷贝一份临时压缩包
     _UPLOAD_SIZE_LIMIT = 512 * 1024 * 1024  # 512 MB
-    temp_archive = base_dir / f"_temp_{filename}"
     try:
         # 确保基础目录存在
         base_dir.mkdir(parents=True, exist_ok=True)
 
-        # 流式写入，按 1 MB 分块，超出大小限制时中断
-        _CHUNK_SIZE = 1 * 1024 * 1024  # 1 MB
-        received = 0
-        with open(temp_archive, "wb") as f:
-            while True:
-                chunk = await file.read(_CHUNK_SIZE)
-                if not chunk:
-                    break
-                received += len(chunk)
-                if received > _UPLOAD_SIZE_LIMIT:
-                    raise HTTPException(
-                        status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                        detail=f"文件超过上限 {_UPLOAD_SIZE_LIMIT // (1024 * 1024)} MB",
-                    )
-                f.write(chunk)
+        received = await asyncio.to_thread(_upload_size, file.file)
+        if received > _UPLOAD_SIZE_LIMIT:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"文件超过上限 {_UPLOAD_SIZE_LIMIT // (1024 * 1024)} MB",
+            )
 
         # ── 3. 解压 ─────────────────────────────────────
         install_dir.mkdir(parents=True, exist_ok=True)
 
+        # 解压与目录整理均为阻塞 IO，放到线程池执行，避免卡住其他请求
         try:
-            _extract_archive(temp_archive, install_dir)
+            await asyncio.to_thread(
+                _extract_archive,
+                file.file,
+                install_dir,
+                flatten_single_root=True,
+                filename=filename,
+            )
         except zipfile.BadZipFile:
             # 清理
-            shutil.rmtree(install_dir, ignore_errors=True)
+            await asyncio.to_thread(shutil.rmtree, install_dir, ignore_errors=True)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="无效的压缩文件",
@@ -413,22 +723,12 @@ async def upload_and_install(
         except (tarfile.TarError, Exception) as exc:
             if isinstance(exc, HTTPException):
                 raise
-            shutil.rmtree(install_dir, ignore_errors=True)
+            await asyncio.to_thread(shutil.rmtree, install_dir, ignore_errors=True)
             raise HTTPException(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail=f"解压失败: {exc}",
             )
 
-        # 处理单层嵌套目录（zip 内只有一个顶层文件夹的情况）
-        children = list(install_dir.iterdir())
-        if len(children) == 1 and children[0].is_dir():
-            nested = children[0]
-            # 将嵌套目录的内容移动到 install_dir
-            for item in nested.iterdir():
-                target = install_dir / item.name
-                shutil.move(str(item), str(target))
-            nested.rmdir()
-
         # ── 4. 启发式寻址 ───────────────────────────────
         executables = _find_executables(install_dir)
 
@@ -438,8 +738,8 @@ async def upload_and_install(
             exe_candidates = []
         else:
             best_exe = _heuristic_pick(executables, software_name)
-            exe_path_str = str(best_exe) if best_exe else str(executables[0])
-            exe_candidates = [str(e) for e in executables[:20]]
+            exe_path_str = os.fspath(best_exe or executables[0])
+            exe_candidates = [os.fspath(e) for e in executables[:20]]
 
         # ── 5. LLM 描述生成（非阻塞） ──────────────────
         description = await _generate_description_via_llm(
@@ -454,8 +754,7 @@ async def upload_and_install(
             description=description or None,
         )
         db.add(item)
-        await db.flush()
-        await db.refresh(item)
+        # commit 时自动 flush，id 由客户端默认值生成，无需 refresh 回读整行
         await db.commit()
 
         logger.info(
@@ -477,9 +776,11 @@ async def upload_and_install(
             install_dir=str(install_dir),
             description=description,
             exe_candidates=exe_candidates,
-            message="安装完成"
-            if exe_path_str
-            else "安装完成（未找到可执行文件，请手动指定）",
+            message=(
+                "安装完成"
+                if exe_path_str
+                else "安装完成（未找到可执行文件，请手动指定）"
+            ),
         )
 
     except HTTPException:
@@ -487,19 +788,12 @@ async def upload_and_install(
     except Exception as e:
         # 清理可能创建的目录
         if install_dir.exists():
-            shutil.rmtree(install_dir, ignore_errors=True)
+            await asyncio.to_thread(shutil.rmtree, install_dir, ignore_errors=True)
         logger.error("安装失败: %s -> %s", filename, e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"安装失败: {e}",
         )
-    finally:
-        # 清理临时文件
-        if temp_archive.exists():
-            try:
-                temp_archive.unlink()
-            except OSError:
-                pass
 
 
 # ── 从本地文件夹安装端点 ─────────────────────────────────
@@ -571,8 +865,8 @@ async def install_from_directory(
             exe_candidates = []
         else:
             best_exe = _heuristic_pick(executables, software_name)
-            exe_path_str = str(best_exe) if best_exe else str(executables[0])
-            exe_candidates = [str(e) for e in executables[:20]]
+            exe_path_str = os.fspath(best_exe or executables[0])
+            exe_candidates = [os.fspath(e) for e in executables[:20]]
 
         # ── 4. LLM 描述生成（非阻塞） ──────────────────
         description = await _generate_description_via_llm(
@@ -587,8 +881,7 @@ async def install_from_directory(
             description=description or None,
         )
         db.add(item)
-        await db.flush()
-        await db.refresh(item)
+        # commit 时自动 flush，id 由客户端默认值生成，无需 refresh 回读整行
         await db.commit()
 
         logger.info(
@@ -610,9 +903,11 @@ async def install_from_directory(
             install_dir=str(dir_path),
             description=description,
             exe_candidates=exe_candidates,
-            message="导入完成"
-            if exe_path_str
-            else "导入完成（未找到可执行文件，请手动指定）",
+            message=(
+                "导入完成"
+                if exe_path_str
+                else "导入完成（未找到可执行文件，请手动指定）"
+            ),
         )
 
     except HTTPException:
@@ -627,6 +922,134 @@ async def install_from_directory(
 
 # ── 扫描导入端点 ─────────────────────────────────────────
 
+_SCAN_COMMIT_BATCH_SIZE = 50
+
+
+async def _commit_scan_batch(
+    db: AsyncSession,
+    pending: list[tuple[dict, dict]],
+    generate_description: bool = False,
+) -> bool:
+    """
+    以单条多行 INSERT 写入一批扫描导入的记录并提交，随后写入向量索引、清空 pending。
+    pending 为 (列字典, 明细) 列表；不经过 ORM 对象的 unit-of-work 开销。
+    generate_description 为 True 时，提交前先并发生成整批描述。
+    提交失败时整批回滚，并将对应明细标记为 failed。返回本批是否已成功提交。
+    """
+    if not pending:
+        return True
+    rows = [row for row, _detail in pending]
+    if generate_description:
+        descriptions = await _generate_descriptions_concurrently(
+            [(row["name"], row["executable_path"]) for row in rows], db
+        )
+        for (row, detail), description in zip(pending, descriptions):
+            row["description"] = description or None
+            detail["description"] = description
+    try:
+        await db.execute(insert(PortableSoftware), rows)
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.warning("扫描导入批量提交失败（%d 条）: %s", len(pending), e)
+        for _item, detail in pending:
+            detail["status"] = "failed"
+            detail["reason"] = str(e)
+        committed = False
+    else:
+        _index_many_to_chroma(rows)
+        committed = True
+    pending.clear()
+    return committed
+
+
+async def _import_scan_batch(
+    db: AsyncSession,
+    candidates: list[tuple[str, Path, str, str | None]],
+    details: list[dict],
+    seen_paths: set[str],
+    seen_names: set[str],
+    generate_description: bool,
+) -> None:
+    """
+    对一批扫描候选统一查重并入库，随后清空 candidates。
+
+    只用一条 IN 查询取回本批路径/名称中已存在于数据库的记录，
+    无需把整张表的 executable_path 读入内存。
+    """
+    if not candidates:
+        return
+
+    paths = {path for _name, _dir, path, error in candidates if path and not error}
+    names = {name for name, _dir, _path, error in candidates if not error}
+    result = await db.execute(
+        select(PortableSoftware.executable_path, PortableSoftware.name).where(
+            or_(
+                PortableSoftware.executable_path.in_(paths),
+                PortableSoftware.name.in_(names),
+            )
+        )
+    )
+    existing_paths = set(seen_paths)
+    existing_names = set(seen_names)
+    for exe_path, name in result.tuples():
+        existing_paths.add(exe_path)
+        existing_names.add(name)
+
+    # 本批待提交的 (列字典, 明细) —— 按批插入并提交以减少 SQLite fsync 次数
+    pending: list[tuple[dict, dict]] = []
+
+    for software_name, subdir, exe_path_str, error in candidates:
+        if error:
+            details.append({"name": software_name, "status": "failed", "reason": error})
+            continue
+
+        # 去重：若路径已在数据库，跳过
+        if exe_path_str and exe_path_str in existing_paths:
+            details.append(
+                {"name": software_name, "status": "skipped", "reason": "已存在"}
+            )
+            continue
+
+        # 按名称去重：若同名软件已存在，也跳过
+        if software_name in existing_names:
+            details.append(
+                {"name": software_name, "status": "skipped", "reason": "同名已存在"}
+            )
+            continue
+
+        # 默认不调用 LLM（避免大量目录时超时），描述留空后续按需生成；
+        # 开启 generate_description 时在提交本批前并发生成
+        description = ""
+
+        # 待写入 SQLite 的行（客户端生成 id，插入前即可用于索引）
+        row = {
+            "id": str(uuid.uuid4()),
+            "name": software_name,
+            "executable_path": exe_path_str,
+            "install_dir": str(subdir),
+            "description": description or None,
+        }
+
+        existing_paths.add(exe_path_str)
+        existing_names.add(software_name)
+        detail = {
+            "name": software_name,
+            "status": "imported",
+            "executable_path": exe_path_str,
+            "description": description,
+        }
+        details.append(detail)
+        pending.append((row, detail))
+        logger.info("扫描导入: %s -> %s", software_name, exe_path_str)
+
+    candidates.clear()
+    rows = [row for row, _detail in pending]
+    # 仅在本批成功提交后才计入跨批去重集合；回滚的记录不应让后续批次误判为已存在
+    if await _commit_scan_batch(db, pending, generate_description):
+        seen_paths.update(row["executable_path"] for row in rows)
+        seen_names.update(row["name"] for row in rows)
+
 
 @router.post(
     "/scan-dirs",
@@ -634,6 +1057,9 @@ async def install_from_directory(
     summary="扫描白名单目录，导入已有便携软件",
 )
 async def scan_and_import(
+    generate_description: bool = Query(
+        False, description="是否为新导入的软件并发调用 LLM 生成描述"
+    ),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -644,15 +1070,14 @@ async def scan_and_import(
       - 仅扫描 type=software 的目录
       - 仅处理直接子目录（不递归跨目录）
       - 若 executable_path 已存在于数据库，跳过（去重）
-      - LLM 描述生成为非阻塞可选步骤
+      - LLM 描述生成为非阻塞可选步骤（generate_description=true 时按批并发生成）
       - 同时更新 ChromaDB 向量索引
     """
     # 读取白名单目录列表，仅取 type=software
     result = await db.execute(
-        select(SystemSetting).where(SystemSetting.key == "allowed_dirs")
+        select(SystemSetting.value).where(SystemSetting.key == "allowed_dirs")
     )
-    setting = result.scalar_one_or_none()
-    entries = parse_allowed_dirs(setting.value if setting else "")
+    entries = parse_allowed_dirs(result.scalar_one_or_none() or "")
     scan_dirs = filter_dirs_by_type(entries, DIR_TYPE_SOFTWARE)
 
     if not scan_dirs:
@@ -665,14 +1090,12 @@ async def scan_and_import(
             message="未配置软件仓目录（type=software），请先在设置中配置",
         )
 
-    # 读取数据库中已有的所有 executable_path，用于去重
-    existing_result = await db.execute(select(PortableSoftware.executable_path))
-    existing_paths: set[str] = {row for row in existing_result.scalars().all() if row}
-
-    imported = 0
-    skipped = 0
-    failed = 0
     details: list[dict] = []
+    # 本次扫描中已成功提交的路径与名称，用于跨批去重
+    seen_paths: set[str] = set()
+    seen_names: set[str] = set()
+    # 待处理的 (软件名, 子目录, 可执行文件路径, 错误信息)，攒满一批后统一查重入库
+    candidates: list[tuple[str, Path, str, str | None]] = []
 
     for base_dir in scan_dirs:
         if not base_dir.exists() or not base_dir.is_dir():
@@ -680,10 +1103,10 @@ async def scan_and_import(
             continue
 
         # 遍历一级子目录，每个子目录视为一个软件
-        for subdir in sorted(base_dir.iterdir()):
-            if not subdir.is_dir():
-                continue
-
+        # （scandir 的 DirEntry.is_dir 直接使用 readdir 返回的类型，无需逐项 stat）
+        with os.scandir(base_dir) as it:
+            subdirs = sorted(Path(entry.path) for entry in it if _entry_is_dir(entry))
+        for subdir in subdirs:
             software_name = subdir.name
 
             try:
@@ -694,70 +1117,35 @@ async def scan_and_import(
                     exe_path_str = ""
                 else:
                     best = _heuristic_pick(executables, software_name)
-                    exe_path_str = str(best) if best else str(executables[0])
-
-                # 去重：若路径已在数据库，跳过
-                if exe_path_str and exe_path_str in existing_paths:
-                    skipped += 1
-                    details.append(
-                        {"name": software_name, "status": "skipped", "reason": "已存在"}
-                    )
-                    continue
-
-                # 按名称去重：若同名软件已存在，也跳过
-                name_check = await db.execute(
-                    select(PortableSoftware).where(
-                        PortableSoftware.name == software_name
-                    )
-                )
-                if name_check.scalar_one_or_none() is not None:
-                    skipped += 1
-                    details.append(
-                        {
-                            "name": software_name,
-                            "status": "skipped",
-                            "reason": "同名已存在",
-                        }
-                    )
-                    continue
-
-                # 批量扫描不调用 LLM（避免大量目录时超时），描述留空后续按需生成
-                description = ""
-
-                # 写入 SQLite
-                item = PortableSoftware(
-                    name=software_name,
-                    executable_path=exe_path_str,
-                    install_dir=str(subdir),
-                    description=description or None,
-                )
-                db.add(item)
-                await db.flush()
-                await db.refresh(item)
-                await db.commit()
-
-                # 写入 ChromaDB
-                _index_to_chroma(item.id, software_name, description, exe_path_str)
-
-                existing_paths.add(exe_path_str)
-                imported += 1
-                details.append(
-                    {
-                        "name": software_name,
-                        "status": "imported",
-                        "executable_path": exe_path_str,
-                        "description": description,
-                    }
-                )
-                logger.info("扫描导入: %s -> %s", software_name, exe_path_str)
-
+                    exe_path_str = os.fspath(best or executables[0])
             except Exception as e:
-                await db.rollback()
-                failed += 1
-                details.append(
-                    {"name": software_name, "status": "failed", "reason": str(e)}
-                )
                 logger.warning("扫描导入失败: %s -> %s", software_name, e)
+                candidates.append((software_name, subdir, "", str(e)))
+            else:
+                candidates.append((software_name, subdir, exe_path_str, None))
+
+            if len(candidates) >= _SCAN_COMMIT_BATCH_SIZE:
+                await _import_scan_batch(
+                    db,
+                    candidates,
+                    details,
+                    seen_paths,
+                    seen_names,
+                    generate_description,
+                )
+
+    await _import_scan_batch(
+        db, candidates, details, seen_paths, seen_names, generate_description
+    )
+
+    imported = skipped = failed = 0
+    for detail in details:
+        if detail["status"] == "imported":
+            imported += 1
+        elif detail["status"] == "skipped":
+            skipped += 1
+        else:
+            failed += 1
 
     return ScanDirsResponse(
         success=True,
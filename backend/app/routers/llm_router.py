@@ -8,19 +8,30 @@
   - 所有响应包含 raw_response 字段，供前端调试监控
 """
 
-import json
+import asyncio
 import logging
+import re
+from typing import Any, NamedTuple
 
-from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
 from fastapi.responses import StreamingResponse
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import (
+    JSON_DECODE_ERRORS,
+    json_dumps,
+    json_dumps_bytes,
+    json_loads,
+)
 from app.core.crypto import encrypt_value
 from app.core.database import get_db
 from app.core.llm_helpers import (
     get_async_openai_client,
+    invalidate_llm_config_cache,
+    llm_config_etag,
     load_llm_config,
+    sse_event,
 )
 from app.models.models import SystemSetting
 from app.schemas.llm_schemas import (
@@ -40,6 +51,61 @@ logger = logging.getLogger(__name__)
 router = APIRouter(prefix="/api/llm", tags=["LLM Gateway"])
 
 
+# ── 公共依赖 ─────────────────────────────────────────────
+
+_DEBUG_QUERY = Query(
+    False, description="为 true 时 raw_response 返回完整的上游原始响应"
+)
+
+
+class LLMContext(NamedTuple):
+    """推理端点的公共上下文：已加载的配置、复用的 Client 与目标模型名。"""
+
+    config: dict[str, str]
+    client: Any
+    model: str
+
+
+async def _llm_context(db: AsyncSession, model_key: str) -> LLMContext:
+    """加载配置、获取 Client 并校验模型名；任何一项缺失均抛出 503。"""
+    config = await load_llm_config(db)
+    client = get_async_openai_client(config)
+
+    model = config.get(model_key, "")
+    if not model:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=f"LLM 未配置: {model_key} 为空。",
+        )
+    return LLMContext(config, client, model)
+
+
+async def llm_chat_context(db: AsyncSession = Depends(get_db)) -> LLMContext:
+    """FastAPI 依赖：使用 model_chat 的推理上下文（async 依赖直接在事件循环上解析）。"""
+    return await _llm_context(db, "model_chat")
+
+
+async def llm_embed_context(db: AsyncSession = Depends(get_db)) -> LLMContext:
+    """FastAPI 依赖：使用 model_embedding 的推理上下文。"""
+    return await _llm_context(db, "model_embedding")
+
+
+def _raw_response(response, debug: bool, **dump_kwargs) -> dict | str:
+    """
+    构建 raw_response：默认只返回 id / model / object 摘要，
+    debug=true 时才完整展开上游响应（model_dump 会复制整棵对象树）。
+    """
+    if not hasattr(response, "model_dump"):
+        return str(response)
+    if debug:
+        return response.model_dump(**dump_kwargs)
+    return {
+        "id": getattr(response, "id", None),
+        "model": getattr(response, "model", None),
+        "object": getattr(response, "object", None),
+    }
+
+
 # ── LLM 配置管理端点 ────────────────────────────────────
 
 
@@ -49,10 +115,23 @@ router = APIRouter(prefix="/api/llm", tags=["LLM Gateway"])
     summary="获取当前 LLM 配置（脱敏）",
 )
 async def get_llm_config(
+    request: Request,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
-    """返回 LLM 配置状态，API Key 仅返回是否已设置。"""
+    """
+    返回 LLM 配置状态，API Key 仅返回是否已设置。
+    响应带 ETag；If-None-Match 命中时直接返回 304，不查库也不序列化。
+    """
+    etag = llm_config_etag()
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag in (t.strip() for t in if_none_match.split(",")):
+        return Response(
+            status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag}
+        )
+
     config = await load_llm_config(db)
+    response.headers["ETag"] = etag
     return _build_config_response(config)
 
 
@@ -63,52 +142,64 @@ async def get_llm_config(
 )
 async def update_llm_config(
     req: LLMConfigUpdate,
+    response: Response,
     db: AsyncSession = Depends(get_db),
 ):
     """更新 LLM 配置项（仅更新非 None 字段）。llm_api_key 自动加密存储。"""
-    update_map = req.model_dump(exclude_unset=True)
-
-    for key, value in update_map.items():
-        # llm_api_key 写入前先加密
-        if key == "llm_api_key" and value:
-            value = encrypt_value(value)
-
-        # llm_dir_context_enabled: bool → "true"/"false" 字符串
-        if key == "llm_dir_context_enabled" and isinstance(value, bool):
-            value = "true" if value else "false"
-
+    update_map = req.model_dump(exclude_unset=True, exclude_none=True)
+
+    # 非字符串字段按 key 直接转换为存储格式，不再逐项判断类型
+    if update_map.get("llm_api_key"):
+        api_key = update_map["llm_api_key"]
+        if api_key == (await load_llm_config(db)).get("llm_api_key"):
+            # 与当前密钥相同：保留已存密文，省去一次加密与写入
+            del update_map["llm_api_key"]
+        else:
+            # llm_api_key 写入前先加密（DPAPI 调用放到线程中，不阻塞事件循环）
+            update_map["llm_api_key"] = await asyncio.to_thread(encrypt_value, api_key)
+    if "llm_dir_context_enabled" in update_map:
+        # bool → "true"/"false" 字符串
+        enabled = update_map["llm_dir_context_enabled"]
+        update_map["llm_dir_context_enabled"] = "true" if enabled else "false"
+    for key in ("ai_blacklist_software", "ai_blacklist_workspace"):
         # 黑名单字段: list[str] → JSON 字符串
-        if key in ("ai_blacklist_software", "ai_blacklist_workspace") and isinstance(
-            value, list
-        ):
-            value = json.dumps(value, ensure_ascii=False)
+        if key in update_map:
+            update_map[key] = json_dumps(update_map[key])
+    if "llm_max_tokens" in update_map:
+        update_map["llm_max_tokens"] = str(update_map["llm_max_tokens"])
 
-        # DB system_settings 所有 value 都是 str，pydantic 可能传入 int
-        db_value = str(value) if not isinstance(value, str) else value
+    # 此时所有值均为 str（DB system_settings 的 value 列为字符串）
+    db_values: dict[str, str] = update_map
 
-        result = await db.execute(select(SystemSetting).where(SystemSetting.key == key))
-        setting = result.scalar_one_or_none()
+    # 一次查询取回所有已存在的配置行，再在内存中更新或新增
+    result = await db.execute(
+        select(SystemSetting).where(SystemSetting.key.in_(db_values))
+    )
+    existing = {setting.key: setting for setting in result.scalars()}
+    for key, db_value in db_values.items():
+        setting = existing.get(key)
         if setting:
             setting.value = db_value
         else:
             db.add(SystemSetting(key=key, value=db_value))
 
-    await db.flush()
     await db.commit()
+    invalidate_llm_config_cache()
     logger.info("LLM 配置已更新: %s", list(update_map.keys()))
 
     # 返回更新后的配置
     config = await load_llm_config(db)
+    response.headers["ETag"] = llm_config_etag()
     return _build_config_response(config)
 
 
 def _parse_json_list(raw: str) -> list[str]:
     """安全解析 JSON 字符串数组，失败时返回空列表。"""
     try:
-        data = json.loads(raw)
+        data = json_loads(raw)
         if isinstance(data, list):
             return [str(item) for item in data]
-    except (json.JSONDecodeError, TypeError):
+    except JSON_DECODE_ERRORS:
         pass
     return []
 
@@ -171,32 +262,24 @@ async def llm_health_check(
         )
 
 
+# 连接测试使用的固定对话
+_TEST_CONNECTION_MESSAGES = [{"role": "user", "content": "Hi, reply with 'OK' only."}]
+
+
 @router.post(
     "/test-connection",
     summary="测试 LLM 连接",
 )
 async def test_llm_connection(
-    db: AsyncSession = Depends(get_db),
+    ctx: LLMContext = Depends(llm_chat_context),
 ):
     """使用当前配置测试 LLM 连接是否可用（发送一次短对话，消耗少量 token）。"""
-    config = await load_llm_config(db)
-
-    try:
-        client = get_async_openai_client(config)
-    except HTTPException:
-        raise
-
-    model = config.get("model_chat", "").strip()
-    if not model:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="LLM 未配置: model_chat 为空。",
-        )
+    client, model = ctx.client, ctx.model
 
     try:
         response = await client.chat.completions.create(
             model=model,
-            messages=[{"role": "user", "content": "Hi, reply with 'OK' only."}],
+            messages=_TEST_CONNECTION_MESSAGES,
             max_tokens=5,
             temperature=0,
         )
@@ -218,6 +301,17 @@ async def test_llm_connection(
 # ── Chat 端点 ────────────────────────────────────────────
 
 
+def _chat_kwargs(req: ChatRequest, model: str, **extra: Any) -> dict[str, Any]:
+    """
+    由请求体一次性生成 chat.completions.create 参数。
+    messages / temperature / max_tokens 由 model_dump 直接产出，未设置的字段自动省略。
+    """
+    kwargs = req.model_dump(exclude_none=True)
+    kwargs["model"] = model
+    kwargs.update(extra)
+    return kwargs
+
+
 @router.post(
     "/chat",
     response_model=ChatResponse,
@@ -226,39 +320,19 @@ async def test_llm_connection(
 )
 async def chat(
     req: ChatRequest,
-    db: AsyncSession = Depends(get_db),
+    debug: bool = _DEBUG_QUERY,
+    ctx: LLMContext = Depends(llm_chat_context),
 ):
     """
     调用 Chat 模型进行多轮对话。
     使用 system_settings 中的 model_chat 配置。
     """
-    config = await load_llm_config(db)
-    client = get_async_openai_client(config)
-
-    model = config.get("model_chat", "").strip()
-    if not model:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="LLM 未配置: model_chat 为空。",
-        )
-
-    messages = [{"role": m.role, "content": m.content} for m in req.messages]
+    client, model = ctx.client, ctx.model
 
     try:
-        kwargs = {
-            "model": model,
-            "messages": messages,
-            "temperature": req.temperature,
-        }
-        if req.max_tokens is not None:
-            kwargs["max_tokens"] = req.max_tokens
+        response = await client.chat.completions.create(**_chat_kwargs(req, model))
 
-        response = await client.chat.completions.create(**kwargs)
-
-        # 构建 raw_response
-        raw = (
-            response.model_dump() if hasattr(response, "model_dump") else str(response)
-        )
+        raw = _raw_response(response, debug)
 
         content = ""
         if response.choices:
@@ -291,6 +365,126 @@ async def chat(
 
 # ── Chat Streaming 端点 (SSE) ────────────────────────────
 
+# SSE 增量帧的固定前后缀: data: {"delta":<json 字符串>}\n\n
+_SSE_DELTA_PREFIX = b'data: {"delta":'
+_SSE_DELTA_SUFFIX = b"}\n\n"
+
+
+def _sse_delta(delta: str) -> bytes:
+    """增量帧：只需 JSON 转义文本本身，无需构造 dict，前后缀为预编码常量。"""
+    return _SSE_DELTA_PREFIX + json_dumps_bytes(delta) + _SSE_DELTA_SUFFIX
+
+
+async def _watch_disconnect(request: Request, disconnected: asyncio.Event) -> None:
+    """后台等待 ASGI http.disconnect 消息，收到后置位事件。"""
+    while True:
+        message = await request.receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+            return
+
+
+# 增量合并：攒够字符数或距首个片段超过时间窗即合并为一帧发出
+_SSE_COALESCE_INTERVAL = 0.016
+_SSE_COALESCE_MAX_CHARS = 256
+# 上游长时间无输出时发送 SSE 注释帧保活，防止代理 / 浏览器判定连接空闲而断开
+_SSE_PING_INTERVAL = 15.0
+_SSE_PING = b": ping\n\n"
+# 同时进行的流式对话上限：每路流都占用一条上游连接与一个协程
+_MAX_CONCURRENT_STREAMS = 32
+_active_streams = 0
+
+
+def _acquire_stream_slot():
+    """
+    占用一个流式对话名额，返回幂等的释放函数；名额已满时抛出 503。
+    """
+    global _active_streams
+    if _active_streams >= _MAX_CONCURRENT_STREAMS:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="并发流式对话过多，请稍后重试。",
+            headers={"Retry-After": "1"},
+        )
+    _active_streams += 1
+    released = False
+
+    def release() -> None:
+        global _active_streams
+        nonlocal released
+        if not released:
+            released = True
+            _active_streams -= 1
+
+    return release
+
+
+class _SlotStreamingResponse(StreamingResponse):
+    """
+    发送结束后释放流式名额的 StreamingResponse。
+
+    生成器的 finally 负责正常结束时及时释放；此处兜底生成器从未启动
+    （如发送响应头时连接已断开）的情况，release 幂等，重复调用无副作用。
+    """
+
+    def __init__(self, content, *, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+async def _coalesce_deltas(stream):
+    """
+    合并上游流中的细碎增量文本，减少 SSE 帧数。
+
+    上游空闲时也会按时间窗把已缓冲的片段发出，不会因等待下一个 chunk 而滞留；
+    超过 _SSE_PING_INTERVAL 无任何输出时产出空串，由调用方发送保活帧。
+    下一个 chunk 用独立 Task 拉取，超时只是停止等待而不取消它，
+    避免中途取消上游流的 __anext__ 破坏其状态。
+    """
+    loop = asyncio.get_running_loop()
+    chunks = stream.__aiter__()
+    buf: list[str] = []
+    size = 0
+    deadline = 0.0
+    pending: asyncio.Future | None = None
+    try:
+        while True:
+            if pending is None:
+                pending = asyncio.ensure_future(chunks.__anext__())
+            timeout = max(deadline - loop.time(), 0.0) if buf else _SSE_PING_INTERVAL
+            done, _ = await asyncio.wait((pending,), timeout=timeout)
+            if done:
+                fut, pending = pending, None
+                try:
+                    chunk = fut.result()
+                except StopAsyncIteration:
+                    break
+                if chunk.choices and chunk.choices[0].delta.content:
+                    delta = chunk.choices[0].delta.content
+                    if not buf:
+                        deadline = loop.time() + _SSE_COALESCE_INTERVAL
+                    buf.append(delta)
+                    size += len(delta)
+                if size < _SSE_COALESCE_MAX_CHARS and loop.time() < deadline:
+                    continue
+            if buf:
+                yield "".join(buf)
+                buf.clear()
+                size = 0
+            elif not done:
+                yield ""
+        if buf:
+            yield "".join(buf)
+    finally:
+        if pending is not None:
+            pending.cancel()
+
 
 @router.post(
     "/chat/stream",
@@ -299,7 +493,7 @@ async def chat(
 async def chat_stream(
     req: ChatRequest,
     request: Request,
-    db: AsyncSession = Depends(get_db),
+    ctx: LLMContext = Depends(llm_chat_context),
 ):
     """
     调用 Chat 模型进行流式对话，通过 Server-Sent Events 逐 token 返回。
@@ -308,56 +502,52 @@ async def chat_stream(
       - data: {"done": true, "content": "...", "usage": {...}} — 完成信号
       - data: {"error": "..."} — 错误信号
     """
-    config = await load_llm_config(db)
-    client = get_async_openai_client(config)
-
-    model = config.get("model_chat", "").strip()
-    if not model:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="LLM 未配置: model_chat 为空。",
-        )
+    client, model = ctx.client, ctx.model
+    kwargs = _chat_kwargs(req, model, stream=True)
 
-    messages = [{"role": m.role, "content": m.content} for m in req.messages]
+    # 检查与占用在同一步完成（之间无 await），避免并发请求同时通过检查
+    release = _acquire_stream_slot()
 
     async def event_generator():
-        full_content = ""
+        # 分片收集，结束时一次拼接，避免逐片 += 反复复制整段文本
+        parts: list[str] = []
+        # 由单个后台任务监听断开，热循环内只做 O(1) 的标志检查
+        disconnected = asyncio.Event()
+        watcher = asyncio.create_task(_watch_disconnect(request, disconnected))
         try:
-            kwargs = {
-                "model": model,
-                "messages": messages,
-                "temperature": req.temperature,
-                "stream": True,
-            }
-            if req.max_tokens is not None:
-                kwargs["max_tokens"] = req.max_tokens
-
             stream = await client.chat.completions.create(**kwargs)
 
-            async for chunk in stream:
+            async for delta in _coalesce_deltas(stream):
                 # 检查客户端是否断开
-                if await request.is_disconnected():
+                if disconnected.is_set():
                     break
-                if chunk.choices and chunk.choices[0].delta.content:
-                    delta = chunk.choices[0].delta.content
-                    full_content += delta
-                    yield f"data: {json.dumps({'delta': delta}, ensure_ascii=False)}\n\n"
+                if not delta:
+                    yield _SSE_PING
+                    continue
+                parts.append(delta)
+                yield _sse_delta(delta)
 
             # 完成信号
-            yield f"data: {json.dumps({'done': True, 'content': full_content, 'model': model}, ensure_ascii=False)}\n\n"
+            full_content = "".join(parts)
+            yield sse_event({"done": True, "content": full_content, "model": model})
             logger.info(
                 "Chat Stream 完成: model=%s, length=%d", model, len(full_content)
             )
 
         except Exception as e:
             logger.error("Chat Stream 失败: %s", e)
-            yield f"data: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+            yield sse_event({"error": str(e)})
+        finally:
+            watcher.cancel()
+            release()
 
-    return StreamingResponse(
+    return _SlotStreamingResponse(
         event_generator(),
+        release=release,
         media_type="text/event-stream",
         headers={
-            "Cache-Control": "no-cache",
+            # no-transform: 禁止中间代理压缩 / 改写，避免事件被攒批后才下发
+            "Cache-Control": "no-cache, no-transform",
             "Connection": "keep-alive",
             "X-Accel-Buffering": "no",
         },
@@ -366,6 +556,137 @@ async def chat_stream(
 
 # ── Embed 端点 ───────────────────────────────────────────
 
+# 请求合批：同一 (client, model) 在时间窗内到达的请求合并为一次上游调用
+_EMBED_BATCH_WINDOW = 0.008
+_EMBED_BATCH_MAX_TEXTS = 256
+# 以 id(client) 作键：待发批次经 call_later 持有 client 引用，期间 id 不会被复用
+_embed_batches: dict[tuple[int, str], list[tuple[list[str], asyncio.Future]]] = {}
+_embed_batch_tasks: set[asyncio.Task] = set()
+
+
+def _flush_embed_batch(client, model: str, batch: list) -> None:
+    """将待发批次移出队列并发起上游调用（批次已被提前发出时忽略）。"""
+    key = (id(client), model)
+    if _embed_batches.get(key) is not batch:
+        return
+    del _embed_batches[key]
+    task = asyncio.create_task(_run_embed_batch(client, model, batch))
+    # 持有任务引用，防止执行中被垃圾回收
+    _embed_batch_tasks.add(task)
+    task.add_done_callback(_embed_batch_tasks.discard)
+
+
+def _response_vectors(response, expected: int) -> list:
+    """取出响应中的向量，条数与输入不一致时抛出 ValueError。"""
+    vectors = [item.embedding for item in response.data]
+    if len(vectors) != expected:
+        raise ValueError(f"上游返回 {len(vectors)} 条向量，与输入 {expected} 条不一致")
+    return vectors
+
+
+async def _embed_single(client, model: str, texts: list[str]):
+    """单个请求独立调用上游（文本去重），返回 (按原顺序排列的向量, 该请求自己的响应)。"""
+    unique = list(dict.fromkeys(texts))
+    response = await client.embeddings.create(model=model, input=unique)
+    vectors = _response_vectors(response, len(unique))
+    index = {text: i for i, text in enumerate(unique)}
+    return [vectors[index[text]] for text in texts], response
+
+
+async def _resolve_single(
+    client, model: str, texts: list[str], fut: asyncio.Future
+) -> None:
+    """为单个等待方独立调用上游并设置其结果，失败只影响该请求。"""
+    try:
+        result = await _embed_single(client, model, texts)
+    except Exception as e:
+        if not fut.done():
+            fut.set_exception(e)
+        return
+    if not fut.done():
+        fut.set_result(result)
+
+
+async def _run_embed_batch(
+    client, model: str, batch: list[tuple[list[str], asyncio.Future]]
+) -> None:
+    """
+    对整批文本去重后调用一次上游，再按各请求原顺序分发结果。
+    合批调用失败或响应不完整时（如某个请求的文本超长、被内容过滤拒绝，
+    或上游少返回了向量）改为逐个请求重试，只让出问题的请求失败。
+    任何意外异常都会传给尚未完成的等待方，不会让调用方永远挂起。
+    """
+    try:
+        if len(batch) == 1:
+            texts, fut = batch[0]
+            await _resolve_single(client, model, texts, fut)
+            return
+
+        unique: dict[str, int] = {}
+        orders = [
+            [unique.setdefault(text, len(unique)) for text in texts]
+            for texts, _ in batch
+        ]
+        try:
+            response = await client.embeddings.create(model=model, input=list(unique))
+            vectors = _response_vectors(response, len(unique))
+            results = [[vectors[i] for i in order] for order in orders]
+        except Exception as e:
+            logger.warning("Embed 合批调用失败，改为逐个请求重试: %s", e)
+            await asyncio.gather(
+                *(
+                    _resolve_single(client, model, texts, fut)
+                    for texts, fut in batch
+                    if not fut.done()
+                )
+            )
+            return
+
+        for result, (_, fut) in zip(results, batch):
+            # 调用方可能已取消等待；合批响应的 id / usage 属于整批，不下发给单个请求
+            if not fut.done():
+                fut.set_result((result, None))
+    except BaseException as e:
+        for _, fut in batch:
+            if fut.done():
+                continue
+            if isinstance(e, Exception):
+                fut.set_exception(e)
+            else:
+                fut.cancel()
+        if not isinstance(e, Exception):
+            raise
+        logger.error("Embed 合批分发失败: %s", e)
+
+
+async def _embed_batched(client, model: str, texts: list[str]):
+    """
+    加入当前批次并等待结果，返回 (按原顺序排列的向量, 上游响应)。
+    与其他请求合批时上游响应为 None；单独调用时为该请求自己的响应。
+    每批文本数不超过 _EMBED_BATCH_MAX_TEXTS，单个请求已达上限时直接单独调用。
+    """
+    if len(texts) >= _EMBED_BATCH_MAX_TEXTS:
+        return await _embed_single(client, model, texts)
+
+    loop = asyncio.get_running_loop()
+    key = (id(client), model)
+    batch = _embed_batches.get(key)
+    if batch is not None:
+        pending = sum(len(t) for t, _ in batch)
+        if pending + len(texts) > _EMBED_BATCH_MAX_TEXTS:
+            # 加入后会超出上限：先发出已有批次，本请求另起新批次
+            _flush_embed_batch(client, model, batch)
+            batch = None
+    if batch is None:
+        batch = _embed_batches[key] = []
+        loop.call_later(_EMBED_BATCH_WINDOW, _flush_embed_batch, client, model, batch)
+
+    fut = loop.create_future()
+    batch.append((texts, fut))
+    if sum(len(t) for t, _ in batch) >= _EMBED_BATCH_MAX_TEXTS:
+        _flush_embed_batch(client, model, batch)
+    return await fut
+
 
 @router.post(
     "/embed",
@@ -375,39 +696,34 @@ async def chat_stream(
 )
 async def embed(
     req: EmbedRequest,
-    db: AsyncSession = Depends(get_db),
+    debug: bool = _DEBUG_QUERY,
+    ctx: LLMContext = Depends(llm_embed_context),
 ):
     """
     调用 Embedding 模型将文本转为向量。
     使用 system_settings 中的 model_embedding 配置。
     """
-    config = await load_llm_config(db)
-    client = get_async_openai_client(config)
-
-    model = config.get("model_embedding", "").strip()
-    if not model:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="LLM 未配置: model_embedding 为空。",
-        )
+    client, model = ctx.client, ctx.model
 
     try:
-        response = await client.embeddings.create(
-            model=model,
-            input=req.texts,
-        )
-
-        raw = (
-            response.model_dump() if hasattr(response, "model_dump") else str(response)
-        )
+        # 与并发请求合批，重复文本只向上游请求一次
+        embeddings, response = await _embed_batched(client, model, req.texts)
 
-        embeddings = [item.embedding for item in response.data]
+        if response is None:
+            # 与其他请求合批：整批的 id / usage 不属于本请求，只返回模型摘要
+            raw = {"id": None, "model": model, "object": "list"}
+        else:
+            # 向量已在 embeddings 中返回，raw_response 不再重复携带，避免双份序列化
+            raw = _raw_response(
+                response, debug, exclude={"data": {"__all__": {"embedding"}}}
+            )
+            model = response.model or model
 
         logger.info("Embed 完成: model=%s, count=%d", model, len(embeddings))
         return EmbedResponse(
             success=True,
             embeddings=embeddings,
-            model=response.model or model,
+            model=model,
             raw_response=raw,
         )
 
@@ -421,6 +737,19 @@ async def embed(
 
 # ── Extract 端点 ─────────────────────────────────────────
 
+# 整段被 markdown 代码块包裹时，直接捕获代码块内的 JSON 正文
+_FENCE_RE = re.compile(r"^```[^\n]*\n?(.*?)\n?\s*```$", re.DOTALL)
+
+# 固定的 system 消息，各请求共享同一 dict（openai 客户端只读不改）
+_EXTRACT_SYSTEM_MESSAGE = {
+    "role": "system",
+    "content": (
+        "你是一个精确的信息提取助手。用户会给你一段文本和一个提取指令，"
+        "你必须严格按照指令从文本中提取信息，并以 JSON 格式返回。"
+        "只返回 JSON，不要附加任何解释文字。"
+    ),
+}
+
 
 @router.post(
     "/extract",
@@ -430,30 +759,17 @@ async def embed(
 )
 async def extract(
     req: ExtractRequest,
-    db: AsyncSession = Depends(get_db),
+    debug: bool = _DEBUG_QUERY,
+    ctx: LLMContext = Depends(llm_chat_context),
 ):
     """
     使用 Chat 模型从文本中提取结构化信息。
     通过 system prompt 引导模型返回 JSON 格式输出。
     """
-    config = await load_llm_config(db)
-    client = get_async_openai_client(config)
-
-    model = config.get("model_chat", "").strip()
-    if not model:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="LLM 未配置: model_chat 为空。",
-        )
-
-    system_prompt = (
-        "你是一个精确的信息提取助手。用户会给你一段文本和一个提取指令，"
-        "你必须严格按照指令从文本中提取信息，并以 JSON 格式返回。"
-        "只返回 JSON，不要附加任何解释文字。"
-    )
+    client, model = ctx.client, ctx.model
 
     messages = [
-        {"role": "system", "content": system_prompt},
+        _EXTRACT_SYSTEM_MESSAGE,
         {
             "role": "user",
             "content": f"提取指令: {req.instruction}\n\n源文本:\n{req.text}",
@@ -467,9 +783,7 @@ async def extract(
             temperature=req.temperature,
         )
 
-        raw = (
-            response.model_dump() if hasattr(response, "model_dump") else str(response)
-        )
+        raw = _raw_response(response, debug)
 
         content = ""
         if response.choices:
@@ -480,13 +794,9 @@ async def extract(
         try:
             # 处理可能被 markdown 代码块包裹的 JSON
             clean = content.strip()
-            if clean.startswith("```"):
-                lines = clean.split("\n")
-                # 移除首尾的 ``` 行
-                lines = [l for l in lines if not l.strip().startswith("```")]
-                clean = "\n".join(lines)
-            extracted = json.loads(clean)
-        except (json.JSONDecodeError, ValueError):
+            match = _FENCE_RE.match(clean)
+            extracted = json_loads(match.group(1) if match else clean)
+        except JSON_DECODE_ERRORS:
             # 保持原始文本
             extracted = content
 
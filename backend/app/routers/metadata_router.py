@@ -7,18 +7,37 @@
   - GET 列表时对路径执行 os.path.exists() 死链检测，标记 is_missing
 """
 
+import asyncio
+import hashlib
+import json
 import logging
 import os
+import re
+import time
 from datetime import datetime, timezone
 from pathlib import Path
 
 from fastapi import APIRouter, Depends, HTTPException, Query, status
-from sqlalchemy import func, select
+from fastapi.responses import StreamingResponse
+from sqlalchemy import Select, column, delete, func, literal_column, select, table
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.config import DIR_TYPE_WORKSPACE, filter_dirs_by_type, parse_allowed_dirs
-from app.core.database import get_db
-from app.core.llm_helpers import get_async_openai_client, load_llm_config
+from app.core.config import (
+    DIR_TYPE_WORKSPACE,
+    filter_dirs_by_type,
+    parse_allowed_dirs,
+)
+from app.core.database import (
+    HAS_TRIGRAM_FTS,
+    NAME_FTS_TABLES,
+    async_session_factory,
+    get_db,
+)
+from app.core.llm_helpers import (
+    get_async_openai_client,
+    load_llm_config,
+    sse_event,
+)
 from app.models.models import PortableSoftware, SystemSetting, Workspace
 from app.schemas.metadata_schemas import (
     AiFillFormRequest,
@@ -43,112 +62,275 @@ router = APIRouter(prefix="/api/metadata", tags=["Metadata CRUD"])
 
 # ── 内部工具函数 ─────────────────────────────────────────
 
+# LLM 响应解析用正则（模块加载时编译一次）
+_JSON_ARRAY_RE = re.compile(r"\[.*?\]", re.DOTALL)
+_JSON_OBJECT_RE = re.compile(r"\{[^{}]*\}", re.DOTALL)
+_ISO_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}$")
+
+# 进行中的 LLM 请求: 请求摘要 -> Task。完全相同的请求（双击、重复提交）共享同一次调用。
+# 只合并并发请求、不缓存结果：用户再次点击“生成”时仍应得到新的回答。
+_inflight_completions: dict[str, asyncio.Task] = {}
+
+
+def _forget_completion(key: str, task: asyncio.Task) -> None:
+    """请求结束后移出登记表，并取走异常，避免无人等待时告警。"""
+    _inflight_completions.pop(key, None)
+    if not task.cancelled():
+        task.exception()
+
+
+async def _create_completion_shared(client, **kwargs):
+    """调用 chat.completions.create；相同参数的并发请求共享结果。"""
+    payload = json.dumps(kwargs, ensure_ascii=False, sort_keys=True)
+    key = hashlib.blake2b(
+        f"{id(client)}:{payload}".encode("utf-8"), digest_size=16
+    ).hexdigest()
+    task = _inflight_completions.get(key)
+    if task is None:
+        task = asyncio.ensure_future(client.chat.completions.create(**kwargs))
+        _inflight_completions[key] = task
+        task.add_done_callback(lambda t: _forget_completion(key, t))
+    # shield: 某个请求方断开只取消它自己的等待，不影响共享同一调用的其他请求
+    return await asyncio.shield(task)
+
 
 async def _is_dir_context_enabled(db: AsyncSession) -> bool:
     """
     从 system_settings 读取 llm_dir_context_enabled 开关（默认开启）。
     值为 "false"（大小写不敏感）时禁用目录上下文收集，防止敏感文件内容上传到 LLM。
     """
-    from sqlalchemy import select as _select
-
     result = await db.execute(
-        _select(SystemSetting).where(SystemSetting.key == "llm_dir_context_enabled")
+        select(SystemSetting.value).where(
+            SystemSetting.key == "llm_dir_context_enabled"
+        )
     )
-    row = result.scalar_one_or_none()
-    if row and str(row.value).strip().lower() == "false":
+    value = result.scalar_one_or_none()
+    if value and str(value).strip().lower() == "false":
         return False
     return True
 
 
+# 按优先级尝试读取的描述文件（大小写不敏感匹配，只取第一个找到的）
+_README_NAMES = (
+    "README.md",
+    "README.txt",
+    "README",
+    "DESCRIPTION",
+    "description.txt",
+    "package.json",
+    "setup.py",
+    "pyproject.toml",
+    "Cargo.toml",
+    "pom.xml",
+)
+
+
 def _collect_dir_context(dir_path: Path, max_files: int = 30) -> str:
     """
     收集目录上下文信息供 LLM 推断软件/项目用途:
       - 顶层文件列表（最多 max_files 个）
       - README / LICENSE 等文件的前几行
+    一次 os.scandir 同时得到文件列表和描述文件位置，不再逐个探测候选文件名。
+    包含阻塞 I/O，调用方应放入线程执行。
     """
-    if not dir_path.is_dir():
+    try:
+        with os.scandir(dir_path) as it:
+            entries = [(entry.name, entry.path, entry.is_dir()) for entry in it]
+    except OSError:
         return ""
 
     lines: list[str] = []
 
-    # 收集一级文件/目录列表
-    try:
-        entries = sorted(
-            dir_path.iterdir(), key=lambda e: (not e.is_dir(), e.name.lower())
-        )
-        file_list = []
-        for entry in entries[:max_files]:
-            prefix = "[DIR]" if entry.is_dir() else f"[{entry.suffix or 'file'}]"
-            file_list.append(f"  {prefix} {entry.name}")
-        if len(entries) > max_files:
-            file_list.append(f"  ... 共 {len(entries)} 项")
-        if file_list:
-            lines.append("目录内容:")
-            lines.extend(file_list)
-    except OSError:
-        pass
+    # 收集一级文件/目录列表（目录在前，名称不区分大小写排序）
+    entries.sort(key=lambda e: (not e[2], e[0].lower()))
+    file_list = []
+    for name, _, is_dir in entries[:max_files]:
+        prefix = "[DIR]" if is_dir else f"[{os.path.splitext(name)[1] or 'file'}]"
+        file_list.append(f"  {prefix} {name}")
+    if len(entries) > max_files:
+        file_list.append(f"  ... 共 {len(entries)} 项")
+    if file_list:
+        lines.append("目录内容:")
+        lines.extend(file_list)
 
     # 尝试读取 README 等描述文件
-    readme_names = [
-        "README.md",
-        "README.txt",
-        "README",
-        "readme.md",
-        "readme.txt",
-        "DESCRIPTION",
-        "description.txt",
-        "package.json",
-        "setup.py",
-        "pyproject.toml",
-        "Cargo.toml",
-        "pom.xml",
-    ]
-    for name in readme_names:
-        readme_path = dir_path / name
-        if readme_path.is_file():
-            try:
-                content = readme_path.read_text(encoding="utf-8", errors="ignore")[:500]
-                lines.append(f"\n{name} 内容 (前500字):")
-                lines.append(content.strip())
-                break  # 只取第一个找到的
-            except OSError:
-                pass
+    files_by_lower = {}
+    for name, path, is_dir in entries:
+        if not is_dir:
+            files_by_lower.setdefault(name.lower(), (name, path))
+    for readme_name in _README_NAMES:
+        found = files_by_lower.get(readme_name.lower())
+        if found is None:
+            continue
+        name, path = found
+        try:
+            with open(path, encoding="utf-8", errors="ignore") as f:
+                content = f.read(500)
+        except OSError:
+            continue
+        lines.append(f"\n{name} 内容 (前500字):")
+        lines.append(content.strip())
+        break  # 只取第一个找到的
 
     return "\n".join(lines)
 
 
 def _check_path_missing(path_str: str) -> bool:
-    """轻量级死链检测: 检查本地路径是否已失效。"""
-    try:
-        return not Path(path_str).exists()
-    except (OSError, ValueError):
-        return True
+    """
+    轻量级死链检测: 检查本地路径是否已失效。
+    直接调用 os.path.exists（不构造 Path），非法路径引发的 OSError / ValueError
+    在其内部即按不存在处理；指向失效目标的符号链接同样视为死链。
+    """
+    return not os.path.exists(path_str)
 
 
-def _to_software_response(item: PortableSoftware) -> SoftwareResponse:
-    """将 ORM 对象转换为响应模型，附加 is_missing / exe_exists / dir_exists 标记。"""
-    exe_path = item.executable_path
-    install_dir = item.install_dir
+# 并发死链检测的上限，避免大列表占满默认线程池
+_PATH_CHECK_CONCURRENCY = 32
+
+# 死链检测结果缓存: 路径 -> (检测时刻 monotonic, 是否失效)
+# 翻页 / 反复刷新列表时同一批路径在 TTL 内不再重复 stat
+_PATH_CACHE_TTL = 30.0
+_PATH_CACHE_MAX = 4096
+_path_missing_cache: dict[str, tuple[float, bool]] = {}
 
-    # 判断 exe 是否存在
-    exe_exists = not _check_path_missing(exe_path) if exe_path else False
 
-    # 判断安装目录是否存在
-    if install_dir:
-        dir_exists = not _check_path_missing(install_dir)
-    elif exe_path:
+def _remember_path_missing(path_str: str, missing: bool, now: float) -> None:
+    """写入检测结果；超过容量时先淘汰过期项，仍超出则整体清空。"""
+    if len(_path_missing_cache) >= _PATH_CACHE_MAX:
+        expired = [
+            p
+            for p, (ts, _) in _path_missing_cache.items()
+            if now - ts >= _PATH_CACHE_TTL
+        ]
+        for p in expired:
+            del _path_missing_cache[p]
+        if len(_path_missing_cache) >= _PATH_CACHE_MAX:
+            _path_missing_cache.clear()
+    _path_missing_cache[path_str] = (now, missing)
+
+
+async def _check_paths_missing(
+    paths: list[str | None], use_cache: bool = True
+) -> list[bool]:
+    """
+    并发检测一组路径是否失效，结果与输入一一对应（空路径视为失效）。
+    stat 在线程中执行：网络盘上单次检测再慢也不会阻塞事件循环。
+    use_cache=False 时强制重新检测（新建 / 修改记录、清理死链等需要准确结果的场景），
+    结果仍会写回缓存。
+    """
+    semaphore = asyncio.Semaphore(_PATH_CHECK_CONCURRENCY)
+    now = time.monotonic()
+
+    async def check(path_str: str) -> bool:
+        if use_cache:
+            cached = _path_missing_cache.get(path_str)
+            if cached is not None and now - cached[0] < _PATH_CACHE_TTL:
+                return cached[1]
+        async with semaphore:
+            missing = await asyncio.to_thread(_check_path_missing, path_str)
+        _remember_path_missing(path_str, missing, time.monotonic())
+        return missing
+
+    # 同一批中重复的路径（如多个软件共用安装目录）只检测一次
+    unique_paths = list(dict.fromkeys(p for p in paths if p))
+    # 单个路径检测异常时按失效处理，不影响同一批的其余结果
+    results = await asyncio.gather(
+        *(check(p) for p in unique_paths), return_exceptions=True
+    )
+    missing_by_path = {
+        p: r if isinstance(r, bool) else True for p, r in zip(unique_paths, results)
+    }
+    return [missing_by_path.get(p, True) for p in paths]
+
+
+def _software_check_paths(item: PortableSoftware) -> tuple[str | None, str | None]:
+    """返回软件记录需要检测的 (exe 路径, 目录路径)。"""
+    exe_path = item.executable_path
+    if item.install_dir:
+        return exe_path, item.install_dir
+    if exe_path:
         # 没有 install_dir 时，用 exe 路径的父目录
+        return exe_path, os.path.dirname(exe_path) or "."
+    return exe_path, None
+
+
+async def _to_software_responses(
+    items: list[PortableSoftware], use_cache: bool = True
+) -> list[SoftwareResponse]:
+    """批量转换软件记录，所有路径检测并发完成。"""
+    paths = [path for item in items for path in _software_check_paths(item)]
+    missing = await _check_paths_missing(paths, use_cache)
+    return [
+        _to_software_response(item, not missing[2 * i], not missing[2 * i + 1])
+        for i, item in enumerate(items)
+    ]
+
+
+async def _to_workspace_responses(
+    items: list[Workspace], use_cache: bool = True
+) -> list[WorkspaceResponse]:
+    """批量转换工作区记录，所有路径检测并发完成。"""
+    missing = await _check_paths_missing(
+        [item.directory_path for item in items], use_cache
+    )
+    return [
+        _to_workspace_response(item, is_missing)
+        for item, is_missing in zip(items, missing)
+    ]
+
+
+# 后台刷新路径缓存：只刷新近期列表页实际展示过的路径，定期（短于 TTL）重新检测，
+# 使仪表盘轮询始终命中缓存；超过活跃窗口未再出现的路径不再刷新，无人访问时不做任何 stat。
+_PATH_REFRESH_INTERVAL = 20.0
+_PATH_REFRESH_ACTIVE_WINDOW = 300.0
+# 刷新集合上限为缓存容量的一半，刷新写回永远不会触发缓存的整体清空
+_PATH_REFRESH_MAX = _PATH_CACHE_MAX // 2
+# 路径 -> 最近一次出现在列表页的时刻（按出现先后排序，最旧的在前）
+_recent_list_paths: dict[str, float] = {}
+
+
+def _track_list_paths(paths) -> None:
+    """记录列表页展示的路径，供后台刷新；超出上限时淘汰最久未出现的路径。"""
+    now = time.monotonic()
+    for path_str in paths:
+        if path_str:
+            _recent_list_paths.pop(path_str, None)
+            _recent_list_paths[path_str] = now
+    while len(_recent_list_paths) > _PATH_REFRESH_MAX:
+        del _recent_list_paths[next(iter(_recent_list_paths))]
+
+
+async def _refresh_path_cache() -> None:
+    """丢弃超出活跃窗口的路径，重新检测其余近期列表路径并写回缓存。"""
+    cutoff = time.monotonic() - _PATH_REFRESH_ACTIVE_WINDOW
+    while _recent_list_paths:
+        oldest = next(iter(_recent_list_paths))
+        if _recent_list_paths[oldest] >= cutoff:
+            break
+        del _recent_list_paths[oldest]
+    if _recent_list_paths:
+        await _check_paths_missing(list(_recent_list_paths), use_cache=False)
+
+
+async def run_path_cache_refresher() -> None:
+    """路径缓存后台刷新循环，由应用 lifespan 启动并在关闭时取消。"""
+    while True:
         try:
-            dir_exists = Path(exe_path).parent.exists()
-        except (OSError, ValueError):
-            dir_exists = False
-    else:
-        dir_exists = False
+            await _refresh_path_cache()
+        except Exception as e:
+            logger.warning("路径缓存后台刷新失败: %s", e)
+        await asyncio.sleep(_PATH_REFRESH_INTERVAL)
+
 
+def _to_software_response(
+    item: PortableSoftware, exe_exists: bool, dir_exists: bool
+) -> SoftwareResponse:
+    """将 ORM 对象转换为响应模型，附加 is_missing / exe_exists / dir_exists 标记。"""
     # is_missing 仅在 exe 不存在 且 目录也不存在时为 True（完全失效）
     is_missing = not exe_exists and not dir_exists
 
-    return SoftwareResponse(
+    # 字段均来自 ORM 对象（类型已由数据库列保证），用 model_construct 跳过逐字段校验
+    return SoftwareResponse.model_construct(
         id=item.id,
         name=item.name,
         executable_path=item.executable_path,
@@ -165,21 +347,81 @@ def _to_software_response(item: PortableSoftware) -> SoftwareResponse:
     )
 
 
-def _to_workspace_response(item: Workspace) -> WorkspaceResponse:
-    """将 ORM 对象转换为响应模型，附加 is_missing 标记。"""
-    return WorkspaceResponse(
+def _to_workspace_response(item: Workspace, is_missing: bool) -> WorkspaceResponse:
+    """将 ORM 对象转换为响应模型，附加 is_missing 标记（同样跳过校验）。"""
+    return WorkspaceResponse.model_construct(
         id=item.id,
         name=item.name,
         directory_path=item.directory_path,
         description=item.description,
         deadline=item.deadline,
         status=item.status,
-        is_missing=_check_path_missing(item.directory_path),
+        is_missing=is_missing,
         created_at=item.created_at,
         updated_at=item.updated_at,
     )
 
 
+# 只读列表按列查询：结果为轻量 Row，不进入 identity map、不做属性插桩。
+# Row 与 ORM 对象同样按属性名取值，可直接交给 _to_*_responses 转换。
+_SOFTWARE_COLUMNS = tuple(PortableSoftware.__table__.columns)
+_WORKSPACE_COLUMNS = tuple(Workspace.__table__.columns)
+
+
+async def _fetch_page(
+    db: AsyncSession, query: Select, order_by, skip: int, limit: int
+) -> tuple[list, int]:
+    """
+    分页查询并同时取得总数：COUNT(*) OVER() 让总数随每行返回，一次往返即可。
+    仅当偏移超出范围（本页为空）时才退回单独的 COUNT 查询。
+    query 应按列选取（见 _SOFTWARE_COLUMNS），返回的 Row 可按列名属性访问。
+    """
+    page_query = (
+        query.add_columns(func.count().over().label("total"))
+        .order_by(order_by)
+        .offset(skip)
+        .limit(limit)
+    )
+    rows = (await db.execute(page_query)).all()
+    if rows:
+        return rows, rows[0].total
+    if skip == 0:
+        return [], 0
+    count_query = select(func.count()).select_from(query.subquery())
+    return [], (await db.execute(count_query)).scalar() or 0
+
+
+# trigram 至少需要 3 个字符才能命中索引，更短的关键词直接 ILIKE
+_FTS_MIN_SEARCH_LEN = 3
+
+
+def _name_search_clause(model, search: str):
+    """按名称模糊搜索的过滤条件；可用时经 FTS5 trigram 索引查 rowid，避免全表扫描。"""
+    pattern = f"%{search}%"
+    if not HAS_TRIGRAM_FTS or len(search) < _FTS_MIN_SEARCH_LEN:
+        return model.name.ilike(pattern)
+    table_name = model.__tablename__
+    fts = table(NAME_FTS_TABLES[table_name], column("rowid"), column("name"))
+    return literal_column(f"{table_name}.rowid").in_(
+        select(fts.c.rowid).where(fts.c.name.like(pattern))
+    )
+
+
+# 单条 DELETE ... IN 的 ID 数上限，避免超出 SQLite 绑定参数限制
+_DELETE_CHUNK_SIZE = 500
+
+
+async def _delete_by_ids(db: AsyncSession, model, ids: list[str]) -> None:
+    """按 ID 批量删除（每批一条 DELETE 语句），调用方负责 commit。"""
+    for start in range(0, len(ids), _DELETE_CHUNK_SIZE):
+        chunk = ids[start : start + _DELETE_CHUNK_SIZE]
+        await db.execute(
+            delete(model)
+            .where(model.id.in_(chunk))
+            .execution_options(synchronize_session=False)
+        )
+
+
 # ══════════════════════════════════════════════════════════
 #  便携软件 CRUD
 # ══════════════════════════════════════════════════════════
@@ -205,12 +447,12 @@ async def create_software(
         icon_path=req.icon_path,
     )
     db.add(item)
-    await db.flush()
-    await db.refresh(item)
     await db.commit()
+    # 只回读数据库生成的时间戳列（id 由客户端生成，commit 已隐式 flush）
+    await db.refresh(item, attribute_names=["created_at", "updated_at"])
 
     logger.info("创建软件记录: %s (%s)", item.name, item.id)
-    return _to_software_response(item)
+    return (await _to_software_responses([item], use_cache=False))[0]
 
 
 @router.get(
@@ -225,22 +467,18 @@ async def list_software(
     db: AsyncSession = Depends(get_db),
 ):
     """获取便携软件列表，返回时自动检测死链。"""
-    query = select(PortableSoftware)
+    query = select(*_SOFTWARE_COLUMNS)
 
     if search:
-        query = query.where(PortableSoftware.name.ilike(f"%{search}%"))
+        query = query.where(_name_search_clause(PortableSoftware, search))
 
-    # 获取总数
-    count_query = select(func.count()).select_from(query.subquery())
-    total = (await db.execute(count_query)).scalar() or 0
-
-    # 分页查询
-    query = query.order_by(PortableSoftware.updated_at.desc()).offset(skip).limit(limit)
-    result = await db.execute(query)
-    items = result.scalars().all()
+    items, total = await _fetch_page(
+        db, query, PortableSoftware.updated_at.desc(), skip, limit
+    )
+    _track_list_paths(path for item in items for path in _software_check_paths(item))
 
-    return SoftwareListResponse(
-        items=[_to_software_response(item) for item in items],
+    return SoftwareListResponse.model_construct(
+        items=await _to_software_responses(items),
         total=total,
     )
 
@@ -261,15 +499,13 @@ async def batch_delete_software(
         )
 
     result = await db.execute(
-        select(PortableSoftware).where(PortableSoftware.id.in_(ids))
+        select(PortableSoftware.id, PortableSoftware.name).where(
+            PortableSoftware.id.in_(ids)
+        )
     )
-    items = result.scalars().all()
-
-    deleted = []
-    for item in items:
-        deleted.append({"id": item.id, "name": item.name})
-        await db.delete(item)
+    deleted = [{"id": item.id, "name": item.name} for item in result]
 
+    await _delete_by_ids(db, PortableSoftware, [d["id"] for d in deleted])
     await db.commit()
     logger.info("批量删除软件: %d 条", len(deleted))
     return {"deleted_count": len(deleted), "deleted": deleted}
@@ -283,17 +519,26 @@ async def cleanup_dead_software(
     db: AsyncSession = Depends(get_db),
 ):
     """扫描所有软件记录，删除路径已失效的条目。"""
-    result = await db.execute(select(PortableSoftware))
-    items = result.scalars().all()
+    result = await db.execute(
+        select(
+            PortableSoftware.id,
+            PortableSoftware.name,
+            PortableSoftware.executable_path,
+            PortableSoftware.install_dir,
+        )
+    )
+    items = result.all()
+
+    # 使用 executable_path 检测死链，若为空则用 install_dir
+    check_paths = [item.executable_path or item.install_dir for item in items]
+    missing = await _check_paths_missing(check_paths, use_cache=False)
 
     removed = []
-    for item in items:
-        # 使用 executable_path 检测死链，若为空则用 install_dir
-        check_path = item.executable_path or item.install_dir
-        if check_path and _check_path_missing(check_path):
+    for item, check_path, is_missing in zip(items, check_paths, missing):
+        if check_path and is_missing:
             removed.append({"id": item.id, "name": item.name, "path": check_path})
-            await db.delete(item)
 
+    await _delete_by_ids(db, PortableSoftware, [r["id"] for r in removed])
     await db.commit()
     logger.info("清理死链软件: 共 %d 条", len(removed))
     return {"removed_count": len(removed), "removed": removed}
@@ -309,10 +554,7 @@ async def get_software(
     db: AsyncSession = Depends(get_db),
 ):
     """根据 ID 获取单个便携软件，附带死链检测。"""
-    result = await db.execute(
-        select(PortableSoftware).where(PortableSoftware.id == software_id)
-    )
-    item = result.scalar_one_or_none()
+    item = await db.get(PortableSoftware, software_id)
 
     if item is None:
         raise HTTPException(
@@ -320,7 +562,7 @@ async def get_software(
             detail=f"软件记录不存在: {software_id}",
         )
 
-    return _to_software_response(item)
+    return (await _to_software_responses([item]))[0]
 
 
 @router.put(
@@ -334,10 +576,7 @@ async def update_software(
     db: AsyncSession = Depends(get_db),
 ):
     """根据 ID 更新便携软件记录（仅更新非 None 字段）。"""
-    result = await db.execute(
-        select(PortableSoftware).where(PortableSoftware.id == software_id)
-    )
-    item = result.scalar_one_or_none()
+    item = await db.get(PortableSoftware, software_id)
 
     if item is None:
         raise HTTPException(
@@ -350,12 +589,12 @@ async def update_software(
         setattr(item, field, value)
     item.updated_at = datetime.now(timezone.utc)
 
-    await db.flush()
-    await db.refresh(item)
     await db.commit()
+    # 回读 updated_at，保持与列表接口一致的数据库存储格式
+    await db.refresh(item, attribute_names=["updated_at"])
 
     logger.info("更新软件记录: %s (%s)", item.name, item.id)
-    return _to_software_response(item)
+    return (await _to_software_responses([item], use_cache=False))[0]
 
 
 @router.delete(
@@ -368,10 +607,7 @@ async def delete_software(
     db: AsyncSession = Depends(get_db),
 ):
     """根据 ID 删除便携软件记录。"""
-    result = await db.execute(
-        select(PortableSoftware).where(PortableSoftware.id == software_id)
-    )
-    item = result.scalar_one_or_none()
+    item = await db.get(PortableSoftware, software_id)
 
     if item is None:
         raise HTTPException(
@@ -387,6 +623,67 @@ async def delete_software(
 # ── 软件 LLM 描述生成 ───────────────────────────────────
 
 
+# finish_reason 为 length 且内容为空时附加的提示
+_TRUNCATED_HINT = (
+    "（模型输出被截断，可能是推理模型消耗了所有 token，"
+    "建议更换非推理模型或增大 token 限制）"
+)
+
+
+async def _stream_software_description(
+    llm_stream, software_id: str, name: str, model: str
+):
+    """
+    以 SSE 逐段转发 LLM 生成的描述，完整结束并写入数据库后发送 done 帧。
+    中途出错、内容为空或保存失败时发送 error 帧且不保存残缺内容；
+    请求会话此时可能已关闭，故使用独立会话写库。
+    """
+    parts: list[str] = []
+    finish_reason = None
+    async with llm_stream:
+        try:
+            async for chunk in llm_stream:
+                if not chunk.choices:
+                    continue
+                finish_reason = chunk.choices[0].finish_reason or finish_reason
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    parts.append(delta)
+                    yield sse_event({"delta": delta})
+        except Exception as e:
+            logger.error("LLM 流式生成软件描述中断: %s -> %s", name, e)
+            yield sse_event({"error": f"LLM 输出中断: {e}"})
+            return
+
+    description = "".join(parts).strip()
+    if not description:
+        logger.warning(
+            "[LLM-EMPTY] 软件描述（流式） | name=%s | finish_reason=%s",
+            name,
+            finish_reason,
+        )
+        hint = _TRUNCATED_HINT if finish_reason == "length" else ""
+        yield sse_event({"error": f"LLM 返回了空内容{hint}"})
+        return
+
+    try:
+        async with async_session_factory() as db:
+            item = await db.get(PortableSoftware, software_id)
+            if item is None:
+                yield sse_event({"error": f"软件记录不存在: {software_id}"})
+                return
+            item.description = description
+            item.updated_at = datetime.now(timezone.utc)
+            await db.commit()
+    except Exception as e:
+        logger.error("保存流式生成的软件描述失败: %s -> %s", name, e)
+        yield sse_event({"error": f"描述保存失败: {e}"})
+        return
+
+    logger.info("LLM 生成软件描述: %s -> %s", name, description[:50])
+    yield sse_event({"done": True, "description": description, "model": model})
+
+
 @router.post(
     "/software/{software_id}/generate-description",
     response_model=GenerateDescriptionResponse,
@@ -395,17 +692,23 @@ async def delete_software(
 async def generate_software_description(
     software_id: str,
     req: GenerateDescriptionRequest | None = None,
+    stream: bool = Query(
+        False,
+        description=(
+            "为 true 时以 SSE 流式返回: 若干 {delta} 帧，保存成功后以 "
+            "{done, description, model} 帧结束；失败（输出中断 / 空内容 / 保存失败）"
+            "以 {error} 帧结束，此时不保存。"
+        ),
+    ),
     db: AsyncSession = Depends(get_db),
 ):
     """
     调用 LLM 根据软件名称和路径信息生成简短描述，并保存到数据库。
-    支持自定义 prompt。
+    支持自定义 prompt。stream=true 时以 SSE 边生成边返回，首个字符无需等待完整回复；
+    流的最后一帧必为 done 或 error，客户端据此判断成败（HTTP 状态码此时已是 200）。
     """
     # 查找软件
-    result = await db.execute(
-        select(PortableSoftware).where(PortableSoftware.id == software_id)
-    )
-    item = result.scalar_one_or_none()
+    item = await db.get(PortableSoftware, software_id)
     if item is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -427,9 +730,11 @@ async def generate_software_description(
     dir_context = ""
     if await _is_dir_context_enabled(db):
         if exe_path:
-            dir_context = _collect_dir_context(exe_path.parent)
+            dir_context = await asyncio.to_thread(_collect_dir_context, exe_path.parent)
         elif item.install_dir:
-            dir_context = _collect_dir_context(Path(item.install_dir))
+            dir_context = await asyncio.to_thread(
+                _collect_dir_context, Path(item.install_dir)
+            )
 
     custom_prompt = req.custom_prompt if req and req.custom_prompt else None
     prompt_mode = req.mode if req else "append"
@@ -476,7 +781,23 @@ async def generate_software_description(
 
     try:
         max_tokens = int(config.get("llm_max_tokens", "1024"))
-        response = await client.chat.completions.create(
+        if stream:
+            # 在返回响应前发起请求：连接 / 鉴权失败仍以 502 报告
+            llm_stream = await client.chat.completions.create(
+                model=model,
+                messages=messages,
+                temperature=0.7,
+                max_tokens=max_tokens,
+                stream=True,
+            )
+            return StreamingResponse(
+                _stream_software_description(llm_stream, item.id, item.name, model),
+                media_type="text/event-stream",
+                headers={"Cache-Control": "no-cache, no-transform"},
+            )
+
+        response = await _create_completion_shared(
+            client,
             model=model,
             messages=messages,
             temperature=0.7,
@@ -520,7 +841,7 @@ async def generate_software_description(
             )
             hint = ""
             if response.choices and response.choices[0].finish_reason == "length":
-                hint = "（模型输出被截断，可能是推理模型消耗了所有 token，建议更换非推理模型或增大 token 限制）"
+                hint = _TRUNCATED_HINT
             reasoning_preview = ""
             if response.choices:
                 rc = (
@@ -539,9 +860,8 @@ async def generate_software_description(
         # 保存到数据库
         item.description = description
         item.updated_at = datetime.now(timezone.utc)
-        await db.flush()
-        await db.refresh(item)
         await db.commit()
+        await db.refresh(item, attribute_names=["updated_at"])
 
         logger.info("LLM 生成软件描述: %s -> %s", item.name, description[:50])
         return GenerateDescriptionResponse(
@@ -573,12 +893,7 @@ async def generate_software_tags(
     调用 LLM 根据软件名称、描述和路径信息推断软件类型标签。
     返回 JSON 数组字符串并保存到数据库。
     """
-    import json as _json
-
-    result = await db.execute(
-        select(PortableSoftware).where(PortableSoftware.id == software_id)
-    )
-    item = result.scalar_one_or_none()
+    item = await db.get(PortableSoftware, software_id)
     if item is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -598,9 +913,11 @@ async def generate_software_tags(
     dir_context = ""
     if await _is_dir_context_enabled(db):
         if exe_path:
-            dir_context = _collect_dir_context(exe_path.parent)
+            dir_context = await asyncio.to_thread(_collect_dir_context, exe_path.parent)
         elif item.install_dir:
-            dir_context = _collect_dir_context(Path(item.install_dir))
+            dir_context = await asyncio.to_thread(
+                _collect_dir_context, Path(item.install_dir)
+            )
 
     context_block = f"\n\n目录文件信息:\n{dir_context}" if dir_context else ""
 
@@ -621,7 +938,8 @@ async def generate_software_tags(
 
     try:
         max_tokens = int(config.get("llm_max_tokens", "256"))
-        response = await client.chat.completions.create(
+        response = await _create_completion_shared(
+            client,
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -634,32 +952,27 @@ async def generate_software_tags(
         tags_str = ""
         if response.choices:
             raw_content = (response.choices[0].message.content or "").strip()
-            # 尝试提取 JSON 数组
-            try:
-                tags = _json.loads(raw_content)
+            # 优先整体解析 JSON 数组；不以 [ 开头时直接从文本中提取 [...] 部分
+            candidates = [raw_content] if raw_content.startswith("[") else []
+            match = _JSON_ARRAY_RE.search(raw_content)
+            if match and match.group() != raw_content:
+                candidates.append(match.group())
+            for candidate in candidates:
+                try:
+                    tags = json.loads(candidate)
+                except json.JSONDecodeError:
+                    continue
                 if isinstance(tags, list):
-                    tags_str = _json.dumps(tags, ensure_ascii=False)
-            except _json.JSONDecodeError:
-                # 尝试从文本中提取 [...] 部分
-                import re
-
-                match = re.search(r"\[.*?\]", raw_content, re.DOTALL)
-                if match:
-                    try:
-                        tags = _json.loads(match.group())
-                        if isinstance(tags, list):
-                            tags_str = _json.dumps(tags, ensure_ascii=False)
-                    except _json.JSONDecodeError:
-                        pass
+                    tags_str = json.dumps(tags, ensure_ascii=False)
+                break
 
         if not tags_str:
             return {"success": False, "tags": "", "message": "LLM 未返回有效标签"}
 
         item.tags = tags_str
         item.updated_at = datetime.now(timezone.utc)
-        await db.flush()
-        await db.refresh(item)
         await db.commit()
+        await db.refresh(item, attribute_names=["updated_at"])
 
         logger.info("LLM 生成软件标签: %s -> %s", item.name, tags_str)
         return {"success": True, "tags": tags_str, "message": "标签生成成功"}
@@ -700,12 +1013,12 @@ async def create_workspace(
     if req.created_at is not None:
         item.created_at = req.created_at
     db.add(item)
-    await db.flush()
-    await db.refresh(item)
     await db.commit()
+    # 只回读数据库生成的时间戳列（id 由客户端生成，commit 已隐式 flush）
+    await db.refresh(item, attribute_names=["created_at", "updated_at"])
 
     logger.info("创建工作区: %s (%s)", item.name, item.id)
-    return _to_workspace_response(item)
+    return (await _to_workspace_responses([item], use_cache=False))[0]
 
 
 @router.get(
@@ -721,24 +1034,20 @@ async def list_workspaces(
     db: AsyncSession = Depends(get_db),
 ):
     """获取工作区列表，返回时自动检测死链。"""
-    query = select(Workspace)
+    query = select(*_WORKSPACE_COLUMNS)
 
     if search:
-        query = query.where(Workspace.name.ilike(f"%{search}%"))
+        query = query.where(_name_search_clause(Workspace, search))
     if status_filter:
         query = query.where(Workspace.status == status_filter)
 
-    # 获取总数
-    count_query = select(func.count()).select_from(query.subquery())
-    total = (await db.execute(count_query)).scalar() or 0
-
-    # 分页查询
-    query = query.order_by(Workspace.updated_at.desc()).offset(skip).limit(limit)
-    result = await db.execute(query)
-    items = result.scalars().all()
+    items, total = await _fetch_page(
+        db, query, Workspace.updated_at.desc(), skip, limit
+    )
+    _track_list_paths(item.directory_path for item in items)
 
-    return WorkspaceListResponse(
-        items=[_to_workspace_response(item) for item in items],
+    return WorkspaceListResponse.model_construct(
+        items=await _to_workspace_responses(items),
         total=total,
     )
 
@@ -761,14 +1070,12 @@ async def batch_delete_workspaces(
             status_code=status.HTTP_400_BAD_REQUEST, detail="ids 不能为空"
         )
 
-    result = await db.execute(select(Workspace).where(Workspace.id.in_(ids)))
-    items = result.scalars().all()
-
-    deleted = []
-    for item in items:
-        deleted.append({"id": item.id, "name": item.name})
-        await db.delete(item)
+    result = await db.execute(
+        select(Workspace.id, Workspace.name).where(Workspace.id.in_(ids))
+    )
+    deleted = [{"id": item.id, "name": item.name} for item in result]
 
+    await _delete_by_ids(db, Workspace, [d["id"] for d in deleted])
     await db.commit()
     logger.info("批量删除工作区: %d 条", len(deleted))
     return {"deleted_count": len(deleted), "deleted": deleted}
@@ -820,22 +1127,56 @@ async def cleanup_dead_workspaces(
     db: AsyncSession = Depends(get_db),
 ):
     """扫描所有工作区记录，删除目录已失效的条目。"""
-    result = await db.execute(select(Workspace))
-    items = result.scalars().all()
+    result = await db.execute(
+        select(Workspace.id, Workspace.name, Workspace.directory_path)
+    )
+    items = result.all()
+
+    missing = await _check_paths_missing(
+        [item.directory_path for item in items], use_cache=False
+    )
 
     removed = []
-    for item in items:
-        if _check_path_missing(item.directory_path):
+    for item, is_missing in zip(items, missing):
+        if is_missing:
             removed.append(
                 {"id": item.id, "name": item.name, "path": item.directory_path}
             )
-            await db.delete(item)
 
+    await _delete_by_ids(db, Workspace, [r["id"] for r in removed])
     await db.commit()
     logger.info("清理死链工作区: 共 %d 条", len(removed))
     return {"removed_count": len(removed), "removed": removed}
 
 
+def _list_subdirs(base_dir: Path) -> list[tuple[str, str]]:
+    """
+    列出 base_dir 的直接子目录，按 readdir 原始顺序返回 (路径, 名称)；目录不存在时
+    返回空列表。同一目录下名称必然唯一，顺序不影响去重结果，无需排序。
+    DirEntry.is_dir 直接使用 readdir 返回的类型信息（与 Path.is_dir 一样跟随符号链接），
+    无需逐项 stat。
+    """
+    subdirs: list[tuple[str, str]] = []
+    try:
+        with os.scandir(base_dir) as it:
+            for entry in it:
+                try:
+                    if entry.is_dir():
+                        subdirs.append((entry.path, entry.name))
+                except OSError:
+                    continue
+    except OSError:
+        return []
+    return subdirs
+
+
+def _new_scanned_workspace(detail: dict) -> Workspace:
+    """按扫描明细构造新的工作区记录（扫描导入默认状态为 active）。"""
+    return Workspace(
+        name=detail["name"], directory_path=detail["path"], status="active"
+    )
+
+
 @router.post(
     "/workspaces/scan",
     response_model=WorkspaceScanResponse,
@@ -856,10 +1197,9 @@ async def scan_workspaces(
     """
     # 读取白名单目录列表，仅取 type=workspace
     result = await db.execute(
-        select(SystemSetting).where(SystemSetting.key == "allowed_dirs")
+        select(SystemSetting.value).where(SystemSetting.key == "allowed_dirs")
     )
-    setting = result.scalar_one_or_none()
-    entries = parse_allowed_dirs(setting.value if setting else "")
+    entries = parse_allowed_dirs(result.scalar_one_or_none() or "")
     scan_dirs = filter_dirs_by_type(entries, DIR_TYPE_WORKSPACE)
 
     if not scan_dirs:
@@ -871,25 +1211,35 @@ async def scan_workspaces(
             message="未配置工作区目录（type=workspace），请先在设置中配置",
         )
 
-    # 读取数据库中已有的 directory_path
-    existing_result = await db.execute(select(Workspace.directory_path))
-    existing_paths: set[str] = {r for r in existing_result.scalars().all() if r}
+    # 一次查询取回已有的 directory_path 与名称，循环内只做集合判断，避免逐个子目录查库
+    existing_result = await db.execute(select(Workspace.directory_path, Workspace.name))
+    existing_paths: set[str] = set()
+    existing_names: set[str] = set()
+    for dir_path, name in existing_result.tuples():
+        if dir_path:
+            existing_paths.add(dir_path)
+        if name:
+            existing_names.add(name)
 
     imported = 0
     skipped = 0
     details: list[dict] = []
+    # 待导入条目的明细，入库成功前先记为 imported，失败时改写为 skipped
+    new_details: list[dict] = []
 
-    for base_dir in scan_dirs:
-        if not base_dir.exists() or not base_dir.is_dir():
-            continue
-
-        for subdir in sorted(base_dir.iterdir()):
-            if not subdir.is_dir():
-                continue
+    # 各工作区根目录在线程中并发列举，不阻塞事件循环
+    listings = await asyncio.gather(
+        *(asyncio.to_thread(_list_subdirs, base_dir) for base_dir in scan_dirs)
+    )
 
-            dir_path_str = str(subdir)
-            ws_name = subdir.name
+    # 刚列举到的子目录必然存在，顺手写入路径缓存，随后的列表请求无需再次 stat
+    listed_at = time.monotonic()
+    for subdirs in listings:
+        for dir_path_str, _ in subdirs:
+            _remember_path_missing(dir_path_str, False, listed_at)
 
+    for subdirs in listings:
+        for dir_path_str, ws_name in subdirs:
             # 路径去重
             if dir_path_str in existing_paths:
                 skipped += 1
@@ -899,37 +1249,45 @@ async def scan_workspaces(
                 continue
 
             # 同名去重
-            name_check = await db.execute(
-                select(Workspace).where(Workspace.name == ws_name)
-            )
-            if name_check.scalar_one_or_none() is not None:
+            if ws_name in existing_names:
                 skipped += 1
                 details.append(
                     {"name": ws_name, "status": "skipped", "reason": "同名已存在"}
                 )
                 continue
 
-            try:
-                item = Workspace(
-                    name=ws_name,
-                    directory_path=dir_path_str,
-                    status="active",
-                )
-                db.add(item)
-                await db.flush()
-                await db.commit()
+            existing_paths.add(dir_path_str)
+            existing_names.add(ws_name)
+            detail = {"name": ws_name, "status": "imported", "path": dir_path_str}
+            new_details.append(detail)
+            details.append(detail)
 
-                existing_paths.add(dir_path_str)
-                imported += 1
-                details.append(
-                    {"name": ws_name, "status": "imported", "path": dir_path_str}
-                )
-                logger.info("工作区扫描导入: %s", dir_path_str)
-            except Exception as e:
-                await db.rollback()
-                skipped += 1
-                details.append({"name": ws_name, "status": "skipped", "reason": str(e)})
-                logger.warning("工作区导入失败: %s -> %s", ws_name, e)
+    # 整批一次事务提交；失败时回滚并逐条重试，只跳过真正失败的条目
+    if new_details:
+        try:
+            db.add_all(_new_scanned_workspace(d) for d in new_details)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.warning("工作区批量导入失败，改为逐条导入: %s", e)
+            for detail in new_details:
+                try:
+                    db.add(_new_scanned_workspace(detail))
+                    await db.commit()
+                except Exception as row_error:
+                    await db.rollback()
+                    detail.pop("path")
+                    detail.update(status="skipped", reason=str(row_error))
+                    logger.warning(
+                        "工作区导入失败: %s -> %s", detail["name"], row_error
+                    )
+
+    for detail in new_details:
+        if detail["status"] == "imported":
+            imported += 1
+            logger.info("工作区扫描导入: %s", detail["path"])
+        else:
+            skipped += 1
 
     return WorkspaceScanResponse(
         success=True,
@@ -953,8 +1311,7 @@ async def get_workspace(
     db: AsyncSession = Depends(get_db),
 ):
     """根据 ID 获取单个工作区，附带死链检测。"""
-    result = await db.execute(select(Workspace).where(Workspace.id == workspace_id))
-    item = result.scalar_one_or_none()
+    item = await db.get(Workspace, workspace_id)
 
     if item is None:
         raise HTTPException(
@@ -962,7 +1319,7 @@ async def get_workspace(
             detail=f"工作区记录不存在: {workspace_id}",
         )
 
-    return _to_workspace_response(item)
+    return (await _to_workspace_responses([item]))[0]
 
 
 @router.put(
@@ -976,8 +1333,7 @@ async def update_workspace(
     db: AsyncSession = Depends(get_db),
 ):
     """根据 ID 更新工作区记录（仅更新非 None 字段）。"""
-    result = await db.execute(select(Workspace).where(Workspace.id == workspace_id))
-    item = result.scalar_one_or_none()
+    item = await db.get(Workspace, workspace_id)
 
     if item is None:
         raise HTTPException(
@@ -990,12 +1346,12 @@ async def update_workspace(
         setattr(item, field, value)
     item.updated_at = datetime.now(timezone.utc)
 
-    await db.flush()
-    await db.refresh(item)
     await db.commit()
+    # 回读 updated_at，保持与列表接口一致的数据库存储格式
+    await db.refresh(item, attribute_names=["updated_at"])
 
     logger.info("更新工作区: %s (%s)", item.name, item.id)
-    return _to_workspace_response(item)
+    return (await _to_workspace_responses([item], use_cache=False))[0]
 
 
 @router.delete(
@@ -1008,8 +1364,7 @@ async def delete_workspace(
     db: AsyncSession = Depends(get_db),
 ):
     """根据 ID 删除工作区记录。"""
-    result = await db.execute(select(Workspace).where(Workspace.id == workspace_id))
-    item = result.scalar_one_or_none()
+    item = await db.get(Workspace, workspace_id)
 
     if item is None:
         raise HTTPException(
@@ -1040,8 +1395,7 @@ async def generate_workspace_description(
     支持自定义 prompt。
     """
     # 查找工作区
-    result = await db.execute(select(Workspace).where(Workspace.id == workspace_id))
-    item = result.scalar_one_or_none()
+    item = await db.get(Workspace, workspace_id)
     if item is None:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -1062,7 +1416,7 @@ async def generate_workspace_description(
     ws_dir = Path(item.directory_path)
     dir_context = ""
     if await _is_dir_context_enabled(db):
-        dir_context = _collect_dir_context(ws_dir)
+        dir_context = await asyncio.to_thread(_collect_dir_context, ws_dir)
 
     custom_prompt = req.custom_prompt if req and req.custom_prompt else None
     prompt_mode = req.mode if req else "append"
@@ -1111,7 +1465,8 @@ async def generate_workspace_description(
 
     try:
         max_tokens = int(config.get("llm_max_tokens", "1024"))
-        response = await client.chat.completions.create(
+        response = await _create_completion_shared(
+            client,
             model=model,
             messages=messages,
             temperature=0.7,
@@ -1153,7 +1508,7 @@ async def generate_workspace_description(
             )
             hint = ""
             if response.choices and response.choices[0].finish_reason == "length":
-                hint = "（模型输出被截断，可能是推理模型消耗了所有 token，建议更换非推理模型或增大 token 限制）"
+                hint = _TRUNCATED_HINT
             reasoning_preview = ""
             if response.choices:
                 rc = (
@@ -1172,9 +1527,8 @@ async def generate_workspace_description(
         # 保存到数据库
         item.description = description
         item.updated_at = datetime.now(timezone.utc)
-        await db.flush()
-        await db.refresh(item)
         await db.commit()
+        await db.refresh(item, attribute_names=["updated_at"])
 
         logger.info("LLM 生成工作区描述: %s -> %s", item.name, description[:50])
         return GenerateDescriptionResponse(
@@ -1213,9 +1567,6 @@ async def ai_fill_workspace_form(
       - deadline: 从目录名中提取的日期 (YYYY-MM-DD)，如果没有则为 null
     不会写入数据库，仅返回建议值供前端填充。
     """
-    import json
-    import re
-
     config = await load_llm_config(db)
     client = get_async_openai_client(config)
     model = config.get("model_chat", "gpt-3.5-turbo")
@@ -1224,8 +1575,8 @@ async def ai_fill_workspace_form(
     dir_name = dir_path.name
     dir_context_enabled = await _is_dir_context_enabled(db)
     dir_context = (
-        _collect_dir_context(dir_path)
-        if (dir_path.is_dir() and dir_context_enabled)
+        await asyncio.to_thread(_collect_dir_context, dir_path)
+        if dir_context_enabled
         else ""
     )
     context_block = f"\n\n目录文件信息:\n{dir_context}" if dir_context else ""
@@ -1252,7 +1603,8 @@ async def ai_fill_workspace_form(
 
     try:
         max_tokens = int(config.get("llm_max_tokens", "1024"))
-        response = await client.chat.completions.create(
+        response = await _create_completion_shared(
+            client,
             model=model,
             messages=[
                 {"role": "system", "content": system_prompt},
@@ -1274,7 +1626,7 @@ async def ai_fill_workspace_form(
             )
 
         # 提取 JSON（兼容 markdown ```json ... ``` 包裹）
-        json_match = re.search(r"\{[^{}]*\}", content, re.DOTALL)
+        json_match = _JSON_OBJECT_RE.search(content)
         if not json_match:
             logger.warning("[LLM-PARSE] 无法从响应中提取 JSON: %s", content[:200])
             return AiFillFormResponse(
@@ -1293,7 +1645,7 @@ async def ai_fill_workspace_form(
         # 校验 created_at 格式
         if created_at:
             created_at = str(created_at).strip()
-            if not re.match(r"^\d{4}-\d{2}-\d{2}$", created_at):
+            if not _ISO_DATE_RE.match(created_at):
                 created_at = None
             elif created_at.lower() == "null":
                 created_at = None
@@ -12,7 +12,7 @@ ChromaDB 使用内置的 default embedding function (all-MiniLM-L6-v2)，
 """
 
 import logging
-from pathlib import Path
+import os
 
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
@@ -42,11 +42,8 @@ router = APIRouter(prefix="/api/search", tags=["Semantic Search"])
 
 
 def _check_path_missing(path_str: str) -> bool:
-    """轻量级死链检测。"""
-    try:
-        return not Path(path_str).exists()
-    except (OSError, ValueError):
-        return True
+    """轻量级死链检测（与 metadata_router 一致，直接使用 os.path.exists）。"""
+    return not os.path.exists(path_str)
 
 
 def _search_collection(
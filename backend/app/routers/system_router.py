@@ -31,6 +31,7 @@ from app.core.config import (
     SHUTDOWN_TOKEN,
 )
 from app.core.database import get_db
+from app.core.llm_helpers import invalidate_llm_config_cache
 from app.models.models import PortableSoftware, SystemSetting, Workspace
 
 
@@ -63,8 +64,12 @@ async def get_init_status(db: AsyncSession = Depends(get_db)):
     前端据此决定是否弹出设置向导。
     """
     keys = ["allowed_dirs", "llm_base_url"]
-    result = await db.execute(select(SystemSetting).where(SystemSetting.key.in_(keys)))
-    settings = {row.key: row.value for row in result.scalars().all()}
+    result = await db.execute(
+        select(SystemSetting.key, SystemSetting.value).where(
+            SystemSetting.key.in_(keys)
+        )
+    )
+    settings = dict(result.tuples().all())
 
     # 解析 allowed_dirs（兼容新旧格式）
     entries = parse_allowed_dirs(settings.get("allowed_dirs", ""))
@@ -89,10 +94,9 @@ async def get_init_status(db: AsyncSession = Depends(get_db)):
 async def get_allowed_dirs(db: AsyncSession = Depends(get_db)):
     """返回当前配置的 allowed_dirs 列表（含类型信息）。"""
     result = await db.execute(
-        select(SystemSetting).where(SystemSetting.key == "allowed_dirs")
+        select(SystemSetting.value).where(SystemSetting.key == "allowed_dirs")
     )
-    setting = result.scalar_one_or_none()
-    entries = parse_allowed_dirs(setting.value if setting else "")
+    entries = parse_allowed_dirs(result.scalar_one_or_none() or "")
     return {"allowed_dirs": entries}
 
 
@@ -360,6 +364,7 @@ async def import_config(
         if ws_updated:
             imported_keys.append(f"_workspace_metadata({ws_updated})")
 
+    db_values: dict[str, str] = {}
     for key, value in config.items():
         if key in skip_keys:
             continue
@@ -391,16 +396,23 @@ async def import_config(
         else:
             str_value = str(value)
 
-        result = await db.execute(select(SystemSetting).where(SystemSetting.key == key))
-        setting = result.scalar_one_or_none()
+        db_values[key] = str_value
+        imported_keys.append(key)
+
+    # 一次查询取回所有已存在的配置行，再在内存中更新或新增
+    result = await db.execute(
+        select(SystemSetting).where(SystemSetting.key.in_(db_values))
+    )
+    existing = {setting.key: setting for setting in result.scalars()}
+    for key, str_value in db_values.items():
+        setting = existing.get(key)
         if setting:
             setting.value = str_value
         else:
             db.add(SystemSetting(key=key, value=str_value))
-        imported_keys.append(key)
 
-    await db.flush()
     await db.commit()
+    invalidate_llm_config_cache()
     logger.info(
         "配置已导入，共 %d 项: %s (跳过: %s)",
         len(imported_keys),
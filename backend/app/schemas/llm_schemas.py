@@ -1,12 +1,11 @@
 """
 Pydantic Schema - 模块 C: Universal LLM Gateway 的请求/响应模型
 支持 Chat / Embed / Extract 三种任务类型。
-所有响应必须包含 raw_response 字段，保留 LLM 返回的原始数据。
+所有响应必须包含 raw_response 字段，默认为摘要，debug=true 时保留 LLM 返回的完整原始数据。
 """
 
 from pydantic import BaseModel, Field
 
-
 # ── Chat Schemas ─────────────────────────────────────────
 
 
@@ -33,7 +32,8 @@ class ChatResponse(BaseModel):
     model: str = Field("", description="实际使用的模型名称")
     usage: dict | None = Field(None, description="Token 使用量统计")
     raw_response: dict | str | None = Field(
-        None, description="LLM 返回的原始响应（供前端调试监控）"
+        None,
+        description="LLM 返回的原始响应摘要；请求带 debug=true 时为完整响应（供调试监控）",
     )
 
 
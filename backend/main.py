@@ -5,14 +5,16 @@ LinkHub - Local Smart Dashboard
 """
 
 import asyncio
+import atexit
 import json
 import logging
 import logging.handlers
 import os
+import queue
 import signal
 import sys
 import webbrowser
-from contextlib import asynccontextmanager
+from contextlib import aclosing, asynccontextmanager
 from pathlib import Path
 
 # ── PyInstaller --noconsole 修复 ──────────────────────────
@@ -41,7 +43,8 @@ from app.core.config import (
     serialize_allowed_dirs,
 )
 from app.core.crypto import encrypt_value, is_encrypted
-from app.core.database import async_session_factory, engine
+from app.core.database import async_session_factory, engine, ensure_name_fts
+from app.core.llm_helpers import close_openai_clients
 from app.core.log_buffer import BufferHandler, log_broadcaster, log_buffer
 from app.models.models import Base, SystemSetting
 from app.routers import (
@@ -65,10 +68,9 @@ root_logger.setLevel(logging.INFO)
 if not any(isinstance(h, BufferHandler) for h in root_logger.handlers):
     _formatter = logging.Formatter(_LOG_FORMAT, datefmt=_LOG_DATEFMT)
 
-    # 控制台 handler
+    # 控制台 handler（经队列在后台线程输出，见下方 QueueListener）
     _console = logging.StreamHandler()
     _console.setFormatter(_formatter)
-    root_logger.addHandler(_console)
 
     # 内存缓冲 handler（供 WebSocket 推送）
     _buffer_handler = BufferHandler()
@@ -87,7 +89,27 @@ if not any(isinstance(h, BufferHandler) for h in root_logger.handlers):
         encoding="utf-8",
     )
     _file_handler.setFormatter(_file_formatter)
-    root_logger.addHandler(_file_handler)
+
+    # 控制台与文件写入是阻塞 I/O：根 logger 只挂 QueueHandler（emit 仅入队），
+    # 由 QueueListener 后台线程实际写出，避免磁盘/终端卡顿拖慢事件循环。
+    # BufferHandler 只写内存，保持同步以便 /api/logs 立即可见。
+    _log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    root_logger.addHandler(logging.handlers.QueueHandler(_log_queue))
+    _log_listener = logging.handlers.QueueListener(
+        _log_queue, _console, _file_handler, respect_handler_level=True
+    )
+    _log_listener.start()
+    # 自行记录后台线程是否在运行，不依赖 QueueListener 的私有属性
+    _log_listener_running = True
+
+    def _stop_log_listener():
+        """停止日志后台线程并写出队列中剩余的日志（可重复调用）。"""
+        global _log_listener_running
+        if _log_listener_running:
+            _log_listener_running = False
+            _log_listener.stop()
+
+    atexit.register(_stop_log_listener)
 
 logger = logging.getLogger("linkhub")
 
@@ -154,7 +176,7 @@ async def _migrate_plaintext_api_key():
 
 async def _migrate_db_schema():
     """
-    启动时自动迁移数据库 Schema：为旧版数据库补充新增列。
+    启动时自动迁移数据库 Schema：为旧版数据库补充新增列与索引。
     使用 ALTER TABLE ADD COLUMN，SQLite 中若列已存在会忽略错误。
     """
     migrations = [
@@ -172,6 +194,19 @@ async def _migrate_db_schema():
                 # 列已存在，忽略
                 pass
 
+        # 旧版数据库建表时没有的索引（create_all 不会为已存在的表补建索引）
+        for index_sql in (
+            "CREATE INDEX IF NOT EXISTS ix_portable_software_executable_path "
+            "ON portable_software (executable_path)",
+            "CREATE INDEX IF NOT EXISTS ix_portable_software_updated_at "
+            "ON portable_software (updated_at)",
+            "CREATE INDEX IF NOT EXISTS ix_workspaces_updated_at "
+            "ON workspaces (updated_at)",
+            "CREATE INDEX IF NOT EXISTS ix_workspaces_status_updated_at "
+            "ON workspaces (status, updated_at)",
+        ):
+            await conn.execute(text(index_sql))
+
 
 # ── 应用生命周期 ──────────────────────────────────────────
 
@@ -189,6 +224,9 @@ async def lifespan(app: FastAPI):
     # 自动迁移: 为旧版数据库补充新增列
     await _migrate_db_schema()
 
+    # 名称子串搜索的 trigram 索引（SQLite 不支持时跳过）
+    await ensure_name_fts()
+
     # 插入默认配置
     await _seed_default_settings()
     logger.info("默认配置已就绪")
@@ -207,6 +245,9 @@ async def lifespan(app: FastAPI):
     except Exception as exc:
         logger.error("ChromaDB 初始化失败: %s", exc, exc_info=True)
 
+    # 死链检测缓存的后台刷新（仅在列表接口近期被访问时工作）
+    path_refresher = asyncio.create_task(metadata_router.run_path_cache_refresher())
+
     logger.info("LinkHub 启动完成 -> http://%s:%s", APP_HOST, APP_PORT)
 
     # 打包模式：服务就绪后才打开浏览器，避免 uvicorn 尚未 accept 时浏览器收到 Not Found
@@ -223,6 +264,12 @@ async def lifespan(app: FastAPI):
 
     yield
 
+    path_refresher.cancel()
+    try:
+        await path_refresher
+    except asyncio.CancelledError:
+        pass
+
     # 关闭 ChromaDB
     try:
         from app.core.vector_store import shutdown_chroma
@@ -231,6 +278,9 @@ async def lifespan(app: FastAPI):
     except ImportError:
         pass
 
+    # 关闭缓存的 LLM Client 连接池
+    await close_openai_clients()
+
     # 关闭引擎连接池
     await engine.dispose()
     logger.info("LinkHub 已关闭")
@@ -330,15 +380,13 @@ async def get_logs(limit: int = 200):
 async def ws_logs(websocket: WebSocket):
     """WebSocket 实时日志推送"""
     await websocket.accept()
-    queue = log_broadcaster.subscribe()
     try:
-        while True:
-            record = await queue.get()
-            await websocket.send_text(json.dumps(record, ensure_ascii=False))
+        # aclosing 确保断开时立即执行订阅生成器的清理（订阅计数 -1）
+        async with aclosing(log_broadcaster.subscribe()) as records:
+            async for record in records:
+                await websocket.send_text(json.dumps(record, ensure_ascii=False))
     except (WebSocketDisconnect, Exception):
         pass
-    finally:
-        log_broadcaster.unsubscribe(queue)
 
 
 # ── 启动入口 ──────────────────────────────────────────────
@@ -399,12 +447,13 @@ if __name__ == "__main__":
 
     # 打包模式防僵尸进程：注册 atexit 确保进程树完整退出
     if IS_FROZEN:
-        import atexit
 
         def _force_exit():
             """兜底退出：若正常 shutdown 流程卡住，强制终止进程。"""
             try:
                 logger.info("atexit: 强制终止进程")
+                # os._exit 不会执行其余 atexit 回调，先写出排队中的日志
+                _stop_log_listener()
             except Exception:
                 pass
             os._exit(0)
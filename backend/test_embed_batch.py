@@ -0,0 +1,129 @@
+"""Embed 请求合批测试脚本（无需启动服务，使用假的 embeddings 客户端）"""
+
+import asyncio
+from types import SimpleNamespace
+
+from app.routers import llm_router
+
+# 所有并发请求都应在该时限内返回；超时即视为等待方被挂起
+TIMEOUT = 2.0
+
+
+class FakeEmbeddings:
+    """记录每次上游调用的输入；向量为 [文本]，便于核对顺序。"""
+
+    def __init__(self, fail_on: str | None = None, drop_when_batched=False):
+        self.calls: list[list[str]] = []
+        self.fail_on = fail_on
+        self.drop_when_batched = drop_when_batched
+
+    async def create(self, model: str, input: list[str]):
+        self.calls.append(list(input))
+        await asyncio.sleep(0)
+        if self.fail_on is not None and self.fail_on in input:
+            raise ValueError(f"rejected: {self.fail_on}")
+        items = [SimpleNamespace(embedding=[text]) for text in input]
+        if self.drop_when_batched and len(input) > 1:
+            items.pop()
+        return SimpleNamespace(data=items, model=model)
+
+
+def fake_client(**kwargs) -> SimpleNamespace:
+    return SimpleNamespace(embeddings=FakeEmbeddings(**kwargs))
+
+
+async def embed_all(client, requests: list[list[str]]) -> list:
+    """并发发起多个请求，返回各自的结果或异常。"""
+    return await asyncio.wait_for(
+        asyncio.gather(
+            *(llm_router._embed_batched(client, "m", texts) for texts in requests),
+            return_exceptions=True,
+        ),
+        TIMEOUT,
+    )
+
+
+def test_concurrent_requests_share_one_call():
+    """并发请求合并为一次上游调用：重复文本只请求一次，各自按原顺序取回结果。"""
+
+    async def run():
+        client = fake_client()
+        results = await embed_all(client, [["a", "b", "a"], ["b", "c"]])
+        assert client.embeddings.calls == [["a", "b", "c"]]
+        assert results == [([["a"], ["b"], ["a"]], None), ([["b"], ["c"]], None)]
+
+    asyncio.run(run())
+
+
+def test_batch_flushes_early_at_max_texts():
+    """超过 _EMBED_BATCH_MAX_TEXTS 时不等时间窗：先发出已有批次，满额批次立即发出。"""
+
+    async def run():
+        client = fake_client()
+        results = await embed_all(
+            client, [["a", "b", "c"], ["d", "e"], ["f", "g"], ["h", "i", "j", "k"]]
+        )
+        assert sorted(client.embeddings.calls) == [
+            ["a", "b", "c"],
+            ["d", "e", "f", "g"],
+            ["h", "i", "j", "k"],
+        ]
+        assert [vectors for vectors, _response in results] == [
+            [["a"], ["b"], ["c"]],
+            [["d"], ["e"]],
+            [["f"], ["g"]],
+            [["h"], ["i"], ["j"], ["k"]],
+        ]
+
+    saved = llm_router._EMBED_BATCH_MAX_TEXTS, llm_router._EMBED_BATCH_WINDOW
+    # 时间窗远大于 TIMEOUT：只有按数量提前发出才能按时返回
+    llm_router._EMBED_BATCH_MAX_TEXTS, llm_router._EMBED_BATCH_WINDOW = 4, 60.0
+    try:
+        asyncio.run(run())
+    finally:
+        llm_router._EMBED_BATCH_MAX_TEXTS, llm_router._EMBED_BATCH_WINDOW = saved
+
+
+def test_failed_batch_only_fails_bad_request():
+    """合批调用失败后逐个请求重试，只有出问题的请求收到异常。"""
+
+    async def run():
+        client = fake_client(fail_on="bad")
+        results = await embed_all(client, [["ok"], ["bad"], ["fine", "ok"]])
+        assert client.embeddings.calls[0] == ["ok", "bad", "fine"]
+        assert sorted(client.embeddings.calls[1:]) == [["bad"], ["fine", "ok"], ["ok"]]
+        assert results[0][0] == [["ok"]]
+        assert isinstance(results[1], ValueError)
+        assert results[2][0] == [["fine"], ["ok"]]
+
+    asyncio.run(run())
+
+
+def test_short_upstream_response_falls_back():
+    """合批响应少返回向量时逐个请求重试，而不是让等待方挂起。"""
+
+    async def run():
+        client = fake_client(drop_when_batched=True)
+        results = await embed_all(client, [["a"], ["b"]])
+        assert [vectors for vectors, _response in results] == [[["a"]], [["b"]]]
+        assert client.embeddings.calls == [["a", "b"], ["a"], ["b"]]
+
+    asyncio.run(run())
+
+
+def test_upstream_raises_fails_every_request():
+    """上游对每次调用都报错时，所有请求都收到异常且不会挂起。"""
+
+    async def run():
+        client = fake_client(fail_on="x")
+        results = await embed_all(client, [["x"], ["x", "y"]])
+        assert all(isinstance(r, ValueError) for r in results), results
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"[PASS] {name}")